@@ -0,0 +1,242 @@
+from constants import EndgameSettings, SearchSettings
+from bitboard import BitBoard, BitboardGameBoard, SQUARE_POSITIONS, square_index, square_position
+from model import CLASSIC
+from evaluation import evaluate
+from tablebase import Result
+from zobrist import Bound, TranspositionTable
+import copy
+import time
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult:
+    def __init__(self, move, score, depth, nodes, elapsed):
+        self.move = move
+        self.score = score
+        self.depth = depth
+        self.nodes = nodes
+        self.elapsed = elapsed
+
+
+class AlphaBetaSearch:
+    def __init__(self, time_budget=SearchSettings.TIME_BUDGET, max_depth=SearchSettings.MAX_DEPTH, transposition_table=None, opening_book=None, tablebase=None):
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.transposition_table = transposition_table if transposition_table else TranspositionTable()
+        self.opening_book = opening_book
+        self.tablebase = tablebase
+        self._path_counts = {}
+        self._deadline = None
+        self._cancelled = None
+        self._known_positions = False
+        self._square_moves = False
+        self._nodes = 0
+        self._killers = []
+        self._history = {}
+
+    def search(self, game_board, progress=None, cancelled=None):
+        # progress(SearchResult) is called after every completed depth, cancelled() stops the search like a timeout
+        board = copy.deepcopy(game_board)
+        board.reset_valid_moves()
+        start = time.perf_counter()
+        self._deadline = start + self.time_budget
+        self._cancelled = cancelled
+        # The opening book and the endgame tables were built under the classic rules
+        self._known_positions = board.get_variant() is CLASSIC
+        # A bitboard is searched on its squares and capture masks, without building pieces
+        self._square_moves = isinstance(board, BitboardGameBoard)
+        self._nodes = 0
+        self._killers = [[None] * SearchSettings.KILLER_SLOTS for _ in range(self.max_depth + 1)]
+        self._history = {}
+        self._path_counts = {board.get_hash(): 1}
+        self.transposition_table.new_search()
+
+        root_moves = self.generate_moves(board)
+        if not root_moves:
+            return SearchResult(None, -SearchSettings.WIN_SCORE, 0, 0, 0.0)
+
+        known_move = self.probe_book(board, root_moves) or self.probe_tablebase_move(board)
+        if known_move:
+            move, score = known_move
+            return SearchResult(move, score, 0, 0, time.perf_counter() - start)
+
+        best_move, best_score, completed_depth = self.move_key(root_moves[0]), 0, 0
+        for depth in range(1, self.max_depth + 1):
+            if completed_depth and time.perf_counter() - start > self.time_budget * SearchSettings.ITERATION_BUDGET_SHARE:
+                break
+            try:
+                score, move = self.search_root(board, root_moves, depth, best_move)
+            except SearchTimeout:
+                break
+            best_move, best_score, completed_depth = move, score, depth
+            if progress:
+                progress(SearchResult(best_move, best_score, completed_depth, self._nodes, time.perf_counter() - start))
+            if abs(score) >= SearchSettings.WIN_SCORE - self.max_depth:
+                break
+        return SearchResult(best_move, best_score, completed_depth, self._nodes, time.perf_counter() - start)
+
+    def search_root(self, board, moves, depth, previous_best):
+        alpha, beta = -SearchSettings.WIN_SCORE - 1, SearchSettings.WIN_SCORE + 1
+        best_move = None
+        for move in self.order_moves(moves, 0, previous_best):
+            memento = self.make_move(board, move)
+            score = -self.alpha_beta(board, depth - 1, 1, -beta, -alpha)
+            self.unmake_move(board, memento)
+            if score > alpha:
+                alpha, best_move = score, self.move_key(move)
+        self.transposition_table.store(board.get_hash(), depth, alpha, Bound.EXACT, best_move)
+        return alpha, best_move
+
+    def alpha_beta(self, board, depth, ply, alpha, beta):
+        self._nodes += 1
+        if self._nodes % SearchSettings.NODES_PER_TIME_CHECK == 0 and (time.perf_counter() > self._deadline or self._cancelled and self._cancelled()):
+            raise SearchTimeout()
+
+        if board.winner():
+            return -SearchSettings.WIN_SCORE + ply
+        position_hash = board.get_hash()
+        if self._path_counts[position_hash] > 1:
+            return 0
+
+        if self._known_positions and self.tablebase and sum(board.get_pieces_left()) <= self.tablebase.max_pieces:
+            score = self.probe_tablebase(board)
+            if score is not None:
+                return score
+
+        entry = self.transposition_table.probe(position_hash)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry.best_move
+            if entry.depth >= depth:
+                score = score_from_table(entry.score, ply)
+                if entry.bound == Bound.EXACT:
+                    return score
+                if entry.bound == Bound.LOWER and score >= beta:
+                    return score
+                if entry.bound == Bound.UPPER and score <= alpha:
+                    return score
+
+        moves = self.generate_moves(board)
+        if not moves:
+            return -SearchSettings.WIN_SCORE + ply
+        if depth <= 0 or ply >= self.max_depth:
+            return evaluate(board)
+
+        original_alpha = alpha
+        best_move = None
+        for move in self.order_moves(moves, ply, hash_move):
+            memento = self.make_move(board, move)
+            score = -self.alpha_beta(board, depth - 1, ply + 1, -beta, -alpha)
+            self.unmake_move(board, memento)
+            if score >= beta:
+                key = self.move_key(move)
+                if not move[2]:
+                    self.store_killer(move, ply)
+                    self._history[key] = self._history.get(key, 0) + depth * depth
+                self.transposition_table.store(position_hash, depth, score_to_table(beta, ply), Bound.LOWER, key)
+                return beta
+            if score > alpha or best_move is None:
+                best_move = self.move_key(move)
+            if score > alpha:
+                alpha = score
+        bound = Bound.EXACT if alpha > original_alpha else Bound.UPPER
+        self.transposition_table.store(position_hash, depth, score_to_table(alpha, ply), bound, best_move)
+        return alpha
+
+    def probe_book(self, board, root_moves):
+        if not self._known_positions or not self.opening_book:
+            return None
+        entry = self.opening_book.lookup(board.get_hash())
+        if entry is None or entry[0] not in [self.move_key(move) for move in root_moves]:
+            return None
+        return entry
+
+    def probe_tablebase_move(self, board):
+        if not self._known_positions or not self.tablebase or sum(board.get_pieces_left()) > self.tablebase.max_pieces:
+            return None
+        bit_board = BitBoard.from_game_board(board)
+        move = self.tablebase.best_move(bit_board)
+        if move is None:
+            return None
+        origin, destination = move
+        return (square_position(origin), square_position(destination)), self.probe_tablebase(board)
+
+    def probe_tablebase(self, board):
+        entry = self.tablebase.probe(BitBoard.from_game_board(board))
+        if entry is None:
+            return None
+        result, distance = entry
+        if result == Result.WIN:
+            return EndgameSettings.TABLEBASE_SCORE - distance
+        if result == Result.LOSS:
+            return -EndgameSettings.TABLEBASE_SCORE + distance
+        return 0
+
+    def generate_moves(self, board):
+        if self._square_moves:
+            return [(SQUARE_POSITIONS[origin], SQUARE_POSITIONS[destination], captured) for origin, piece_moves in board.legal_square_moves().items() for destination, captured in piece_moves.items()]
+        moves = []
+        for origin, piece_moves in board.all_legal_moves().items():
+            for destination, captured in piece_moves.items():
+                moves.append((origin, destination, tuple((captured_piece.row, captured_piece.col) for captured_piece in captured)))
+        return moves
+
+    def order_moves(self, moves, ply, best_move):
+        killers = self._killers[ply]
+
+        def priority(move):
+            key = self.move_key(move)
+            if key == best_move:
+                return 3, 0
+            if move[2]:
+                return 2, move[2].bit_count() if self._square_moves else len(move[2])
+            if key in killers:
+                return 1, 0
+            return 0, self._history.get(key, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def store_killer(self, move, ply):
+        key = self.move_key(move)
+        killers = self._killers[ply]
+        if key not in killers:
+            killers.insert(0, key)
+            killers.pop()
+
+    def make_move(self, board, move):
+        origin, destination, captured = move
+        if self._square_moves:
+            memento = board.play(square_index(*origin), square_index(*destination), captured)
+        else:
+            memento = board.make_move(board.get_field(*origin), *destination, [board.get_field(row, col) for row, col in captured])
+        self._path_counts[board.get_hash()] = self._path_counts.get(board.get_hash(), 0) + 1
+        return memento
+
+    def unmake_move(self, board, memento):
+        self._path_counts[board.get_hash()] -= 1
+        board.revert_move(memento)
+
+    @staticmethod
+    def move_key(move):
+        return move[0], move[1]
+
+
+def score_to_table(score, ply):
+    # Win scores are stored relative to the position so they stay valid at any ply
+    if score >= SearchSettings.WIN_SCORE - SearchSettings.MAX_DEPTH:
+        return score + ply
+    if score <= -SearchSettings.WIN_SCORE + SearchSettings.MAX_DEPTH:
+        return score - ply
+    return score
+
+
+def score_from_table(score, ply):
+    if score >= SearchSettings.WIN_SCORE - SearchSettings.MAX_DEPTH:
+        return score - ply
+    if score <= -SearchSettings.WIN_SCORE + SearchSettings.MAX_DEPTH:
+        return score + ply
+    return score
+
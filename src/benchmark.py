@@ -0,0 +1,264 @@
+from constants import BenchmarkSettings, Colors, Direction
+from bitboard import BitboardGameBoard
+from model import Caretaker, GameBoard, GameModel, INTERNATIONAL, NORMAL_MOVE_STRATEGY, KING_MOVE_STRATEGY
+from savefile import decode_game, encode_game, replay_game
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+
+
+def play_random_game(game_board, rng, max_plies, caretaker=None):
+    plies = 0
+    while plies < max_plies and not game_board.winner():
+        moves = game_board.all_legal_moves()
+        origin = rng.choice(sorted(moves))
+        destination = rng.choice(sorted(moves[origin]))
+        game_board.select(*origin)
+        game_board.select(*destination)
+        if caretaker is not None:
+            caretaker.add_memento(game_board.get_last_move())
+        plies += 1
+    return plies
+
+
+def create_fixtures(seed):
+    opening = GameBoard()
+
+    midgame, caretaker = GameBoard(), Caretaker()
+    play_random_game(midgame, random.Random(seed), BenchmarkSettings.MIDGAME_PLIES, caretaker)
+
+    # A red king in front of a ladder of white men, so captures chain upwards
+    kings = GameBoard()
+    kings.set_position([(5, 2, Colors.RED, True), (7, 0, Colors.RED, True), (4, 3, Colors.WHITE, False), (2, 3, Colors.WHITE, False),
+                        (2, 5, Colors.WHITE, False), (0, 1, Colors.WHITE, True), (1, 6, Colors.WHITE, True)], Colors.RED)
+
+    bitboard = BitboardGameBoard()
+    bitboard.set_position(*midgame.get_position())
+
+    international = GameBoard(INTERNATIONAL)
+    play_random_game(international, random.Random(seed), BenchmarkSettings.MIDGAME_PLIES)
+    return {'opening': opening, 'midgame': (midgame, caretaker), 'kings': kings, 'bitboard': bitboard, 'international': international}
+
+
+def benchmark_explore_chain(fixtures):
+    board = fixtures['kings']
+    captured = board.get_field(4, 3)
+    board_rows = board.get_board()
+
+    def operation():
+        NORMAL_MOVE_STRATEGY.explore_chain((3, 4), Direction.UP, captured, Colors.RED, board_rows, [])
+    return operation
+
+
+def benchmark_man_moves(fixtures):
+    board, _ = fixtures['midgame']
+    men = [piece for piece in board.get_pieces(board.get_turn()) if not piece.is_king()]
+    board_rows = board.get_board()
+
+    def operation():
+        for piece in men:
+            NORMAL_MOVE_STRATEGY.get_valid_moves(piece, board_rows)
+    return operation
+
+
+def benchmark_king_moves(fixtures):
+    board = fixtures['kings']
+    kings = [piece for piece in board.get_pieces(Colors.RED) if piece.is_king()]
+    board_rows = board.get_board()
+
+    def operation():
+        for piece in kings:
+            KING_MOVE_STRATEGY.get_valid_moves(piece, board_rows)
+    return operation
+
+
+def legal_moves_operation(board):
+    def operation():
+        board.reset_legal_moves()
+        board.all_legal_moves()
+    return operation
+
+
+def benchmark_legal_moves(fixtures):
+    board, _ = fixtures['midgame']
+    return legal_moves_operation(board)
+
+
+def benchmark_bitboard_legal_moves(fixtures):
+    return legal_moves_operation(fixtures['bitboard'])
+
+
+def benchmark_international_legal_moves(fixtures):
+    return legal_moves_operation(fixtures['international'])
+
+
+def select_operation(board):
+    def operation():
+        board.select(5, 2)
+        board.select(4, 3)
+        board.revert_move(board.get_last_move())
+    return operation
+
+
+def benchmark_select(fixtures):
+    return select_operation(fixtures['opening'])
+
+
+def benchmark_bitboard_select(fixtures):
+    return select_operation(BitboardGameBoard())
+
+
+def benchmark_memento(fixtures):
+    game_model = GameModel()
+    board = game_model.game_board
+
+    def operation():
+        board.select(5, 2)
+        board.select(4, 3)
+        game_model.restore_from_memento(game_model.save_to_memento())
+    return operation
+
+
+def benchmark_undo_redo(fixtures):
+    board, caretaker = fixtures['midgame']
+    game_model = GameModel()
+    game_model.game_board = board
+
+    def operation():
+        game_model.restore_from_memento(caretaker.get_undo_memento())
+        game_model.replay_memento(caretaker.get_redo_memento())
+    return operation
+
+
+def benchmark_save(fixtures):
+    board, caretaker = fixtures['midgame']
+
+    def operation():
+        encode_game(board, caretaker)
+    return operation
+
+
+def benchmark_load(fixtures):
+    board, caretaker = fixtures['midgame']
+    data = encode_game(board, caretaker)
+
+    def operation():
+        replay_game(decode_game(data))
+    return operation
+
+
+BENCHMARKS = [
+    ('MoveStrategy.explore_chain', 'kings', benchmark_explore_chain),
+    ('NormalMoveStrategy.get_valid_moves', 'midgame', benchmark_man_moves),
+    ('KingMoveStrategy.get_valid_moves', 'kings', benchmark_king_moves),
+    ('GameBoard.all_legal_moves', 'midgame', benchmark_legal_moves),
+    ('BitboardGameBoard.all_legal_moves', 'midgame', benchmark_bitboard_legal_moves),
+    ('GameBoard.all_legal_moves 10x10', 'international', benchmark_international_legal_moves),
+    ('GameBoard.select/move_to', 'opening', benchmark_select),
+    ('BitboardGameBoard.select/move_to', 'opening', benchmark_bitboard_select),
+    ('GameModel.save_to_memento', 'opening', benchmark_memento),
+    ('Caretaker undo/redo', 'midgame', benchmark_undo_redo),
+    ('save_file', 'midgame', benchmark_save),
+    ('load_file', 'midgame', benchmark_load)
+]
+
+
+def measure(operation, min_time):
+    operation()
+    count, batch, elapsed = 0, 1, 0.0
+    while elapsed < min_time:
+        start = time.perf_counter()
+        for _ in range(batch):
+            operation()
+        elapsed += time.perf_counter() - start
+        count += batch
+        batch *= 2
+    return count, elapsed
+
+
+def measure_allocations(operation, samples):
+    # Peak traced memory above the starting point, averaged over single operations
+    tracemalloc.start()
+    total = 0
+    for _ in range(samples):
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        operation()
+        total += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+    return total // samples
+
+
+def run_random_games(games, seed, max_plies):
+    plies = 0
+    start = time.perf_counter()
+    for game in range(games):
+        plies += play_random_game(GameBoard(), random.Random(seed + game), max_plies)
+    elapsed = time.perf_counter() - start
+    return {'name': 'random games', 'fixture': 'start', 'games': games, 'plies': plies, 'seconds': round(elapsed, 6),
+            'games_per_sec': round(games / elapsed, 2), 'plies_per_sec': round(plies / elapsed, 2)}
+
+
+def get_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(args):
+    results = []
+    for name, fixture, create in BENCHMARKS:
+        if args.filter and args.filter not in name:
+            continue
+        count, elapsed = measure(create(create_fixtures(args.seed)), args.min_time)
+        peak_bytes = measure_allocations(create(create_fixtures(args.seed)), BenchmarkSettings.ALLOCATION_SAMPLES)
+        results.append({'name': name, 'fixture': fixture, 'ops': count, 'seconds': round(elapsed, 6),
+                        'ops_per_sec': round(count / elapsed, 2), 'peak_bytes_per_op': peak_bytes})
+    if args.games and (not args.filter or args.filter in 'random games'):
+        results.append(run_random_games(args.games, args.seed, BenchmarkSettings.MAX_PLIES))
+    return {
+        'revision': get_revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results
+    }
+
+
+def compare(report, baseline):
+    previous = {result['name']: result for result in baseline['results']}
+    for result in report['results']:
+        key = 'ops_per_sec' if 'ops_per_sec' in result else 'plies_per_sec'
+        old = previous.get(result['name'], {}).get(key)
+        change = f"{100 * (result[key] / old - 1):+.1f}%" if old else 'new'
+        print(f"  {result['name']:<40} {result[key]:>14.1f} {key}  {change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Time the model hot paths and write the results as JSON')
+    parser.add_argument('--min-time', type=float, default=BenchmarkSettings.MIN_TIME, help='seconds spent timing each benchmark')
+    parser.add_argument('--games', type=int, default=BenchmarkSettings.RANDOM_GAMES, help='random games played for the throughput benchmark, 0 skips it')
+    parser.add_argument('--seed', type=int, default=BenchmarkSettings.SEED, help='seed for the fixtures and random games')
+    parser.add_argument('--filter', help='only run benchmarks whose name contains this text')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    parser.add_argument('--output', default=BenchmarkSettings.OUTPUT, help='file receiving the JSON report')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args)
+    with open(args.output, 'w') as output:
+        json.dump(report, output, indent=2)
+
+    baseline = {'results': []}
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+from constants import BoardSettings, Colors, Direction
+from model import GameBoard, GameBoardMemento, Piece, CLASSIC, NORMAL_MOVE_STRATEGY
+from zobrist import piece_key, turn_key, WHITE_TO_MOVE_KEY
+
+
+class Squares:
+    COUNT = 32
+    FULL_MASK = (1 << COUNT) - 1
+    NONE = -1
+
+
+def square_index(row, col):
+    return row * 4 + col // 2
+
+
+def square_position(square):
+    row = square // 4
+    return row, 2 * (square % 4) + (row + 1) % 2
+
+
+def is_playable(row, col):
+    return 0 <= row < BoardSettings.ROWS and 0 <= col < BoardSettings.COLS and (row + col) % 2 == 1
+
+
+def _build_tables():
+    neighbours = [[Squares.NONE] * Squares.COUNT for _ in Direction.ALL]
+    jumps = [[Squares.NONE] * Squares.COUNT for _ in Direction.ALL]
+    chain_jumps = [[Squares.NONE] * Squares.COUNT for _ in Direction.ALL]
+    for square in range(Squares.COUNT):
+        row, col = square_position(square)
+        for direction, (row_step, col_step) in enumerate(Direction.OFFSETS):
+            if is_playable(row + row_step, col + col_step):
+                neighbours[direction][square] = square_index(row + row_step, col + col_step)
+            if is_playable(row + 2 * row_step, col + 2 * col_step):
+                jumps[direction][square] = square_index(row + 2 * row_step, col + 2 * col_step)
+                # The list-of-lists engine never continues an upward multi-jump onto row 0
+                if row_step > 0 or row + 2 * row_step > 0:
+                    chain_jumps[direction][square] = jumps[direction][square]
+    return neighbours, jumps, chain_jumps
+
+
+NEIGHBOURS, JUMPS, CHAIN_JUMPS = _build_tables()
+SQUARE_BITS = [1 << square for square in range(Squares.COUNT)]
+SQUARE_POSITIONS = [square_position(square) for square in range(Squares.COUNT)]
+
+
+def _step_masks(directions):
+    return [sum(SQUARE_BITS[NEIGHBOURS[direction][square]] for direction in directions if NEIGHBOURS[direction][square] != Squares.NONE) for square in range(Squares.COUNT)]
+
+
+STEP_MASKS = {Colors.RED: _step_masks(Direction.UP), Colors.WHITE: _step_masks(Direction.DOWN)}
+KING_STEP_MASKS = _step_masks(Direction.ALL)
+BOARD_SQUARES = [[square_index(row, col) if is_playable(row, col) else Squares.NONE for col in range(BoardSettings.COLS)] for row in range(BoardSettings.ROWS)]
+PROMOTION_MASK = sum(SQUARE_BITS[square] for square in range(Squares.COUNT) if square_position(square)[0] in [0, BoardSettings.ROWS - 1])
+RED_START = sum(SQUARE_BITS[square] for square in range(Squares.COUNT) if square_position(square)[0] > 4)
+WHITE_START = sum(SQUARE_BITS[square] for square in range(Squares.COUNT) if square_position(square)[0] < 3)
+
+
+def _build_square_tables():
+    # One piece and one Zobrist key per square, colour and rank; the pieces are shared, so they are never changed
+    pieces, keys = {}, {}
+    for square in range(Squares.COUNT):
+        row, col = square_position(square)
+        for color in [Colors.RED, Colors.WHITE]:
+            for king in [False, True]:
+                piece = Piece(row, col, color, NORMAL_MOVE_STRATEGY)
+                if king:
+                    piece.make_king()
+                pieces[square, color, king] = piece
+                keys[square, color, king] = piece_key(row, col, color, king)
+    return pieces, keys
+
+
+SQUARE_PIECES, SQUARE_KEYS = _build_square_tables()
+
+
+def iterate_squares(mask):
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+class BitBoard:
+    __slots__ = ('red', 'white', 'kings', 'turn')
+
+    def __init__(self, red=RED_START, white=WHITE_START, kings=0, turn=Colors.RED):
+        self.red = red
+        self.white = white
+        self.kings = kings
+        self.turn = turn
+
+    @classmethod
+    def from_game_board(cls, game_board):
+        bit_board = cls(0, 0, 0, game_board.get_turn())
+        for square in range(Squares.COUNT):
+            field = game_board.get_field(*square_position(square))
+            if field != BoardSettings.EMPTY_FIELD:
+                if field.color == Colors.RED:
+                    bit_board.red |= SQUARE_BITS[square]
+                else:
+                    bit_board.white |= SQUARE_BITS[square]
+                if field.is_king():
+                    bit_board.kings |= SQUARE_BITS[square]
+        return bit_board
+
+    def to_game_board(self):
+        game_board = GameBoard()
+        game_board.set_position([square_position(square) + (self.get_color(square), bool(self.kings & SQUARE_BITS[square])) for square in iterate_squares(self.red | self.white)], self.turn)
+        return game_board
+
+    def copy(self):
+        return BitBoard(self.red, self.white, self.kings, self.turn)
+
+    def get_color(self, square):
+        if self.red & SQUARE_BITS[square]:
+            return Colors.RED
+        if self.white & SQUARE_BITS[square]:
+            return Colors.WHITE
+        return None
+
+    def own_and_enemy(self, color):
+        return (self.red, self.white) if color == Colors.RED else (self.white, self.red)
+
+    def move_map(self):
+        # Origin square -> destination square -> captured mask for the side to move
+        own, enemy = self.own_and_enemy(self.turn)
+        empty = ~(self.red | self.white) & Squares.FULL_MASK
+        reachable = empty | enemy
+        step_masks = STEP_MASKS[self.turn]
+        moves = {}
+        for origin in iterate_squares(own):
+            # Pieces hemmed in by their own side have nothing to generate
+            if (KING_STEP_MASKS if self.kings & SQUARE_BITS[origin] else step_masks)[origin] & reachable:
+                piece_moves = self._square_moves(origin, self.turn, enemy, empty)
+                if piece_moves:
+                    moves[origin] = piece_moves
+        return moves
+
+    def _square_moves(self, square, color, enemy, empty):
+        if self.kings & SQUARE_BITS[square]:
+            directions = Direction.ALL
+        else:
+            directions = Direction.UP if color == Colors.RED else Direction.DOWN
+
+        moves = {}
+        for direction in directions:
+            neighbour = NEIGHBOURS[direction][square]
+            if neighbour == Squares.NONE:
+                continue
+            if empty & SQUARE_BITS[neighbour]:
+                moves[neighbour] = 0
+            elif enemy & SQUARE_BITS[neighbour]:
+                landing = JUMPS[direction][square]
+                if landing != Squares.NONE and empty & SQUARE_BITS[landing]:
+                    moves[landing] = SQUARE_BITS[neighbour]
+                    self._explore_chain(landing, direction < Direction.DOWN_LEFT, SQUARE_BITS[neighbour], enemy, empty, moves)
+        return moves
+
+    def _explore_chain(self, square, upwards, previous, enemy, empty, moves):
+        for direction in Direction.UP if upwards else Direction.DOWN:
+            neighbour = NEIGHBOURS[direction][square]
+            if neighbour == Squares.NONE or not enemy & SQUARE_BITS[neighbour]:
+                continue
+            landing = CHAIN_JUMPS[direction][square]
+            if landing != Squares.NONE and empty & SQUARE_BITS[landing]:
+                # Like the list-of-lists engine, a chain only remembers the last two captures
+                moves[landing] = SQUARE_BITS[neighbour] | previous
+                self._explore_chain(landing, upwards, SQUARE_BITS[neighbour], enemy, empty, moves)
+
+    def legal_moves(self):
+        return [(origin, destination, captured) for origin, piece_moves in self.move_map().items() for destination, captured in piece_moves.items()]
+
+    def make_move(self, origin, destination, captured):
+        origin_bit, destination_bit = SQUARE_BITS[origin], SQUARE_BITS[destination]
+        if self.turn == Colors.RED:
+            self.red ^= origin_bit | destination_bit
+            self.white &= ~captured
+        else:
+            self.white ^= origin_bit | destination_bit
+            self.red &= ~captured
+        if self.kings & origin_bit:
+            self.kings ^= origin_bit | destination_bit
+        elif destination_bit & PROMOTION_MASK:
+            self.kings |= destination_bit
+        self.kings &= ~captured
+        self.change_turn()
+
+    def change_turn(self):
+        self.turn = Colors.WHITE if self.turn == Colors.RED else Colors.RED
+
+    def red_left(self):
+        return self.red.bit_count()
+
+    def white_left(self):
+        return self.white.bit_count()
+
+    def winner(self):
+        return Colors.WHITE if not self.red else Colors.RED if not self.white else None
+
+
+class BitboardGameBoard:
+    def __init__(self, bit_board=None):
+        self._bit_board = bit_board if bit_board else BitBoard()
+        self._selected = None
+        self._valid_moves = {}
+        self._legal_moves = None
+        self._last_move = None
+        self._hash = self.compute_hash()
+
+    def compute_hash(self):
+        bit_board = self._bit_board
+        position_hash = turn_key(bit_board.turn)
+        for square in iterate_squares(bit_board.red | bit_board.white):
+            position_hash ^= SQUARE_KEYS[square, bit_board.get_color(square), bool(bit_board.kings & SQUARE_BITS[square])]
+        return position_hash
+
+    def select(self, row, col):
+        if not is_playable(row, col) or self._bit_board.get_color(square_index(row, col)) is None:
+            return self.move_to(row, col)
+        else:
+            return self.select_piece(square_index(row, col))
+
+    def move_to(self, row, col):
+        successful = True
+        if (row, col) in self._valid_moves:
+            self._last_move = self.play(self._selected, square_index(row, col), self._valid_moves[(row, col)])
+        else:
+            successful = False
+
+        self._selected = None
+        self._valid_moves = {}
+        return successful
+
+    def select_piece(self, square):
+        if self._bit_board.get_color(square) == self._bit_board.turn:
+            # Only the selected piece's moves are turned into positions, captures stay masks
+            self._valid_moves = {SQUARE_POSITIONS[destination]: captured for destination, captured in self.legal_square_moves().get(square, {}).items()}
+            self._selected = None if not self._valid_moves else square
+        return False
+
+    def make_move(self, piece, row, col, captured_pieces):
+        captured = 0
+        for captured_piece in captured_pieces:
+            captured |= SQUARE_BITS[square_index(captured_piece.row, captured_piece.col)]
+        return self.play(square_index(piece.row, piece.col), square_index(row, col), captured)
+
+    def play(self, origin, destination, captured):
+        bit_board = self._bit_board
+        turn = bit_board.turn
+        was_king = bool(bit_board.kings & SQUARE_BITS[origin])
+        captured_pieces = tuple(square_position(square) + (bit_board.get_color(square), bool(bit_board.kings & SQUARE_BITS[square])) for square in iterate_squares(captured))
+        position_hash = self._hash ^ SQUARE_KEYS[origin, turn, was_king] ^ WHITE_TO_MOVE_KEY
+        for row, col, color, king in captured_pieces:
+            position_hash ^= piece_key(row, col, color, king)
+        bit_board.make_move(origin, destination, captured)
+        is_king = bool(bit_board.kings & SQUARE_BITS[destination])
+        self._hash = position_hash ^ SQUARE_KEYS[destination, turn, is_king]
+        self._legal_moves = None
+        return GameBoardMemento(square_position(origin), square_position(destination), captured_pieces, is_king and not was_king, turn)
+
+    def revert_move(self, memento):
+        bit_board = self._bit_board
+        turn = memento.get_turn()
+        origin, destination = square_index(*memento.get_origin()), square_index(*memento.get_destination())
+        origin_bit, destination_bit = SQUARE_BITS[origin], SQUARE_BITS[destination]
+        is_king = bool(bit_board.kings & destination_bit)
+        was_king = is_king and not memento.is_promotion()
+        self._hash ^= SQUARE_KEYS[destination, turn, is_king] ^ SQUARE_KEYS[origin, turn, was_king]
+        if turn == Colors.RED:
+            bit_board.red ^= origin_bit | destination_bit
+        else:
+            bit_board.white ^= origin_bit | destination_bit
+        if is_king:
+            bit_board.kings ^= destination_bit
+            if was_king:
+                bit_board.kings |= origin_bit
+        for row, col, color, king in memento.get_captured():
+            if color == Colors.RED:
+                bit_board.red |= SQUARE_BITS[square_index(row, col)]
+            else:
+                bit_board.white |= SQUARE_BITS[square_index(row, col)]
+            if king:
+                bit_board.kings |= SQUARE_BITS[square_index(row, col)]
+            self._hash ^= piece_key(row, col, color, king)
+        if bit_board.turn != turn:
+            self._hash ^= WHITE_TO_MOVE_KEY
+        bit_board.turn = turn
+        self._legal_moves = None
+        self._selected = None
+        self._valid_moves = {}
+
+    def replay_move(self, memento):
+        captured = sum(SQUARE_BITS[square_index(row, col)] for row, col, _, _ in memento.get_captured())
+        self._last_move = self.play(square_index(*memento.get_origin()), square_index(*memento.get_destination()), captured)
+        self._selected = None
+        self._valid_moves = {}
+
+    def get_last_move(self):
+        return self._last_move
+
+    def set_position(self, pieces, turn):
+        red = white = kings = 0
+        for row, col, color, king in pieces:
+            if color == Colors.RED:
+                red |= SQUARE_BITS[square_index(row, col)]
+            else:
+                white |= SQUARE_BITS[square_index(row, col)]
+            if king:
+                kings |= SQUARE_BITS[square_index(row, col)]
+        self._bit_board = BitBoard(red, white, kings, turn)
+        self._selected = None
+        self._valid_moves = {}
+        self._legal_moves = None
+        self._last_move = None
+        self._hash = self.compute_hash()
+
+    def get_position(self):
+        pieces = tuple(square_position(square) + (self._bit_board.get_color(square), bool(self._bit_board.kings & SQUARE_BITS[square])) for square in iterate_squares(self._bit_board.red | self._bit_board.white))
+        return pieces, self._bit_board.turn
+
+    def get_bit_board(self):
+        return self._bit_board
+
+    def get_piece_or_empty_field(self, row, col):
+        return self.get_field(row, col)
+
+    def get_field(self, row, col):
+        square = BOARD_SQUARES[row][col]
+        if square == Squares.NONE:
+            return BoardSettings.EMPTY_FIELD
+        bit_board, square_bit = self._bit_board, SQUARE_BITS[square]
+        if bit_board.red & square_bit:
+            color = Colors.RED
+        elif bit_board.white & square_bit:
+            color = Colors.WHITE
+        else:
+            return BoardSettings.EMPTY_FIELD
+        return SQUARE_PIECES[square, color, bool(bit_board.kings & square_bit)]
+
+    def get_pieces(self, color):
+        own, _ = self._bit_board.own_and_enemy(color)
+        return [SQUARE_PIECES[square, color, bool(self._bit_board.kings & SQUARE_BITS[square])] for square in iterate_squares(own)]
+
+    def get_pieces_left(self):
+        return self._bit_board.red_left(), self._bit_board.white_left()
+
+    def change_turn(self):
+        self._valid_moves = {}
+        self._legal_moves = None
+        self._bit_board.change_turn()
+        self._hash ^= WHITE_TO_MOVE_KEY
+
+    def winner(self):
+        winner = self._bit_board.winner()
+        if winner is None and not self.has_legal_move():
+            winner = Colors.WHITE if self._bit_board.turn == Colors.RED else Colors.RED
+        return winner
+
+    def legal_square_moves(self):
+        # Origin square -> destination square -> captured mask, computed once per position
+        if self._legal_moves is None:
+            self._legal_moves = self._bit_board.move_map()
+        return self._legal_moves
+
+    def all_legal_moves(self):
+        # Same shape as GameBoard.all_legal_moves, with the shared read-only pieces as captures
+        turn = self._bit_board.turn
+        enemy = Colors.WHITE if turn == Colors.RED else Colors.RED
+        kings = self._bit_board.kings
+        return {SQUARE_POSITIONS[origin]: {SQUARE_POSITIONS[destination]: [SQUARE_PIECES[square, enemy, bool(kings & SQUARE_BITS[square])] for square in iterate_squares(captured)]
+                                          for destination, captured in moves.items()}
+                for origin, moves in self.legal_square_moves().items()}
+
+    def has_legal_move(self):
+        return bool(self.legal_square_moves())
+
+    def get_turn(self):
+        return self._bit_board.turn
+
+    def get_variant(self):
+        # 32-bit masks only fit the classic board
+        return CLASSIC
+
+    def get_hash(self):
+        return self._hash
+
+    def get_valid_moves(self):
+        return self._valid_moves
+
+    def reset_valid_moves(self):
+        self._valid_moves = {}
+
+    def reset_legal_moves(self):
+        self._legal_moves = None
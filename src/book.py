@@ -0,0 +1,90 @@
+from constants import EndgameSettings
+from ai import AlphaBetaSearch
+from bitboard import square_index, square_position
+from model import GameBoard
+import argparse
+import mmap
+import os
+import struct
+import time
+
+HEADER = struct.Struct('<4sBI')
+ENTRY = struct.Struct('<QBBh')
+
+
+def build_book(filename, plies, depth, progress=None):
+    game_board = GameBoard()
+    search = AlphaBetaSearch(float('inf'), depth)
+    entries = {}
+
+    def expand(ply):
+        position_hash = game_board.get_hash()
+        if ply >= plies or position_hash in entries:
+            return
+        result = search.search(game_board)
+        if result.move is None:
+            return
+        origin, destination = result.move
+        entries[position_hash] = (square_index(*origin), square_index(*destination), result.score)
+        if progress and len(entries) % 500 == 0:
+            progress(f"{len(entries)} book positions")
+        for origin, destination, captured in search.generate_moves(game_board):
+            memento = game_board.make_move(game_board.get_field(*origin), *destination, [game_board.get_field(row, col) for row, col in captured])
+            expand(ply + 1)
+            game_board.revert_move(memento)
+
+    expand(0)
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(EndgameSettings.BOOK_MAGIC, EndgameSettings.VERSION, len(entries)))
+        for position_hash in sorted(entries):
+            file.write(ENTRY.pack(position_hash, *entries[position_hash]))
+    return len(entries)
+
+
+class OpeningBook:
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self._count = HEADER.unpack_from(self._buffer, 0)
+        if magic != EndgameSettings.BOOK_MAGIC or version > EndgameSettings.VERSION:
+            raise ValueError(f"{filename} is not a supported opening book")
+
+    def close(self):
+        self._buffer.close()
+
+    def __len__(self):
+        return self._count
+
+    def lookup(self, position_hash):
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry_hash, origin, destination, score = ENTRY.unpack_from(self._buffer, HEADER.size + middle * ENTRY.size)
+            if entry_hash < position_hash:
+                low = middle + 1
+            elif entry_hash > position_hash:
+                high = middle
+            else:
+                return (square_position(origin), square_position(destination)), score
+        return None
+
+
+def load_book(filename=EndgameSettings.BOOK_FILE):
+    return OpeningBook(filename) if os.path.exists(filename) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the opening book from fixed-depth searches')
+    parser.add_argument('--plies', type=int, default=EndgameSettings.BOOK_PLIES, help='cover every position this many plies from the start')
+    parser.add_argument('--depth', type=int, default=EndgameSettings.BOOK_DEPTH, help='search depth used to pick each book move')
+    parser.add_argument('--output', default=EndgameSettings.BOOK_FILE)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    start = time.perf_counter()
+    count = build_book(args.output, args.plies, args.depth, print)
+    print(f"Stored {count} positions in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
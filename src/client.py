@@ -0,0 +1,108 @@
+from constants import Colors, NetworkSettings
+from server import apply_square, decode_board, encode_message
+from bitboard import square_index
+from tournament import create_player
+import argparse
+import asyncio
+import json
+
+COLORS = {'red': Colors.RED, 'white': Colors.WHITE}
+
+
+class GameClient:
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self.bit_board = None
+        self.color = None
+        self.ready = False
+        self.winner = None
+
+    @classmethod
+    async def connect(cls, host=NetworkSettings.HOST, port=NetworkSettings.PORT):
+        reader, writer = await asyncio.open_connection(host, port, limit=NetworkSettings.LINE_LIMIT)
+        return cls(reader, writer)
+
+    async def send(self, message):
+        self._writer.write(encode_message(message))
+        await self._writer.drain()
+
+    async def receive(self):
+        line = await self._reader.readline()
+        if not line:
+            return None
+        message = json.loads(line)
+        self.apply(message)
+        return message
+
+    async def join(self, game_id):
+        await self.send({'type': 'join', 'game': game_id})
+
+    async def move(self, origin, destination):
+        await self.send({'type': 'move', 'from': list(origin), 'to': list(destination)})
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+
+    def apply(self, message):
+        message_type = message.get('type')
+        if message_type in ('joined', 'ready', 'state'):
+            self.bit_board = decode_board(message['board'], message['turn'])
+            self.ready = message['ready']
+            if message_type == 'joined':
+                self.color = COLORS.get(message['color'])
+        elif message_type == 'update':
+            for row, col, code in message['changes']:
+                apply_square(self.bit_board, square_index(row, col), code)
+            self.bit_board.turn = COLORS[message['turn']]
+        if message_type in ('joined', 'ready', 'state', 'update'):
+            self.winner = COLORS.get(message['winner'])
+
+    def is_my_turn(self):
+        return self.ready and self.winner is None and self.color is not None and self.bit_board.turn == self.color
+
+
+async def play(host, port, game_id, player_spec, seed):
+    client = await GameClient.connect(host, port)
+    await client.join(game_id)
+    player = create_player(player_spec, seed)
+    plies = 0
+    try:
+        while client.winner is None:
+            message = await client.receive()
+            if message is None:
+                break
+            if message['type'] == 'error':
+                print("Server error:", message['message'])
+            if message['type'] == 'left':
+                print("Opponent left the game")
+                break
+            if message['type'] == 'update':
+                plies += 1
+            if client.is_my_turn():
+                move = player.choose_move(client.bit_board.to_game_board())
+                if move is None:
+                    break
+                await client.move(*move)
+    finally:
+        await client.close()
+    winner = {Colors.RED: 'red', Colors.WHITE: 'white'}.get(client.winner, 'none')
+    return winner, plies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play a Dame game on a server without the GUI')
+    parser.add_argument('--host', default=NetworkSettings.HOST)
+    parser.add_argument('--port', type=int, default=NetworkSettings.PORT)
+    parser.add_argument('--game', default='default', help='game to join or create')
+    parser.add_argument('--player', default='random', help="'random', 'ai:<seconds>' or 'depth:<plies>'")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    winner, plies = asyncio.run(play(args.host, args.port, args.game, args.player, args.seed))
+    print(f"Game '{args.game}' finished after {plies} plies, winner: {winner}")
+
+
+if __name__ == "__main__":
+    main()
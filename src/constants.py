@@ -1,4 +1,4 @@
-import pygame
+import os
 
 
 class BoardSettings:
@@ -11,11 +11,24 @@ class BoardSettings:
     EMPTY_FIELD = 0
 
 
+class TimelineSettings:
+    TOP = BoardSettings.HEIGHT + 72
+    HEIGHT = 14
+    MARGIN = 20
+    MARKER_WIDTH = 2
+
+
 class PieceSettings:
     PADDING = 15
     OUTLINE = 2
 
 
+class FontSettings:
+    NAME = 'comicsans'
+    BUTTON_SIZE = 30
+    WINNER_SIZE = 60
+
+
 class Colors:
     RED = (255, 0, 0)
     GREEN = (0, 255, 0)
@@ -34,19 +47,151 @@ class Actions:
     SAVE = 'save'
     UNDO = 'undo'
     MOVE = 'move'
+    AI = 'ai'
+    SEEK = 'seek'
+    BRANCH = 'branch'
 
 
 class Assets:
-    CROWN = pygame.transform.scale(pygame.image.load('../assets/crown.png'), (45, 45))
-    LOGO = pygame.image.load('../assets/dame.png')
+    DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'assets')
+    CROWN = None
+    LOGO = None
+
+    @classmethod
+    def load(cls):
+        # Deferred until a GameView exists so the model can be imported without pygame
+        if cls.CROWN is None:
+            import pygame
+            cls.CROWN = pygame.transform.scale(pygame.image.load(os.path.join(cls.DIRECTORY, 'crown.png')), (45, 45))
+            cls.LOGO = pygame.image.load(os.path.join(cls.DIRECTORY, 'dame.png'))
 
 
 class Settings:
     FPS = 60
+    EVENT_DRIVEN = True
+    IDLE_TIMEOUT = 1000
+
+
+class SearchSettings:
+    TIME_BUDGET = 1.0
+    MAX_DEPTH = 64
+    NODES_PER_TIME_CHECK = 64
+    # A new iteration is not started once this share of the budget is spent, it would rarely finish
+    ITERATION_BUDGET_SHARE = 0.5
+    WIN_SCORE = 100000
+    KILLER_SLOTS = 2
+    TRANSPOSITION_TABLE_SIZE = 1 << 18
+
+
+class EvaluationSettings:
+    MAN_VALUE = 100
+    KING_VALUE = 160
+    ADVANCEMENT_VALUE = 2
+    BACK_RANK_VALUE = 4
+    MOBILITY_VALUE = 3
+
+
+class TournamentSettings:
+    TIME_BUDGET = 0.1
+    MAX_DEPTH = 64
+    MAX_PLIES = 300
+    CHUNKS_PER_WORKER = 4
+
+
+class BenchmarkSettings:
+    MIN_TIME = 0.5
+    ALLOCATION_SAMPLES = 50
+    SEED = 0
+    MIDGAME_PLIES = 16
+    RANDOM_GAMES = 100
+    MAX_PLIES = 300
+    OUTPUT = 'benchmark.json'
+
+
+class InstrumentationSettings:
+    ENABLED = False
+    OUTPUT = 'metrics'
+    BUCKETS = 32
+    TRACE_FRAMES = 1
+    TOP_ALLOCATIONS = 25
+
+
+class HistorySettings:
+    MEMORY_LIMIT = 256
+    CHECKPOINT_INTERVAL = 64
+    MAX_BRANCHES = 32
+    SPILL_TO_DISK = True
+    COMPRESSION_LEVEL = 6
+
+
+class VariantSettings:
+    DEFAULT = 'classic'
+
+
+class PerftSettings:
+    DEPTH = 6
+
+
+class RegressionSettings:
+    POSITIONS = 20000
+    SEED = 0
+    PERFT_DEPTH = 6
+    # Published leaf counts from the start position for depths 1 to 7
+    PUBLISHED_PERFT = {'english': (7, 49, 302, 1469, 7361, 36768, 179740),
+                       'international': (9, 81, 658, 4265, 27117, 167140, 1049442)}
+
+
+class JobSettings:
+    WORKERS = 2
+
+
+class SaveSettings:
+    MAGIC = b'DAME'
+    VERSION = 2
+    EXTENSION = '.dame'
+
+
+class PdnSettings:
+    EXTENSION = '.pdn'
+    EVENT = 'Dame'
+    LINE_LENGTH = 79
+    # PDN has no GameType for the classic rules, so they are named in a tag of their own
+    VARIANT_TAG = 'DameVariant'
+
+
+class NetworkSettings:
+    HOST = '127.0.0.1'
+    PORT = 8765
+    LINE_LIMIT = 4096
+
+
+class EndgameSettings:
+    DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+    BOOK_FILE = os.path.join(DATA_DIRECTORY, 'opening.book')
+    TABLEBASE_FILE = os.path.join(DATA_DIRECTORY, 'endgame.tb')
+    BOOK_MAGIC = b'DBOK'
+    TABLEBASE_MAGIC = b'DTBE'
+    VERSION = 1
+    BOOK_PLIES = 4
+    BOOK_DEPTH = 4
+    TABLEBASE_PIECES = 3
+    TABLEBASE_SCORE = 50000
+
+
+class ZobristSettings:
+    SEED = 20240501
+    BITS = 64
+    MAX_SIZE = 10
 
 
 class Direction:
-    LEFT = 5
-    RIGHT = 6
+    UP_LEFT = 0
+    UP_RIGHT = 1
+    DOWN_LEFT = 2
+    DOWN_RIGHT = 3
+    UP = (UP_LEFT, UP_RIGHT)
+    DOWN = (DOWN_LEFT, DOWN_RIGHT)
+    ALL = UP + DOWN
     POSITIVE_STEP = 1
     NEGATIVE_STEP = -1
+    OFFSETS = ((NEGATIVE_STEP, NEGATIVE_STEP), (NEGATIVE_STEP, POSITIVE_STEP), (POSITIVE_STEP, NEGATIVE_STEP), (POSITIVE_STEP, POSITIVE_STEP))
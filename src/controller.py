@@ -1,12 +1,21 @@
 import pygame
-from constants import BoardSettings, Actions
+from constants import BoardSettings, Actions, HistorySettings, PdnSettings, SaveSettings, SearchSettings, Settings
 from view import GameView
-from model import GameModel, Caretaker
+from model import GameModel, Caretaker, CLASSIC
+from ai import AlphaBetaSearch
+from book import load_book
+from tablebase import load_tablebase
+from savefile import encode_game, load_game, replay_game
+from pdn import export_game, load_pdn
+from instrumentation import Instrumentation
+from jobs import JobManager, JobStatus
 import tkinter as tk
 from tkinter import filedialog
-import pickle
 import copy
 import os
+import threading
+
+JOB_EVENT = pygame.event.custom_type()
 
 
 class GameCommand:
@@ -16,81 +25,274 @@ class GameCommand:
     def execute(self):
         raise NotImplementedError("Execute method must be implemented")
 
+    # Called on the main thread for background jobs the command submitted under its action name
+    def progress(self, value):
+        pass
+
+    def finish(self, result):
+        pass
+
+    def fail(self, error):
+        print("Command failed:", error)
+
 
 class SaveCommand(GameCommand):
     def execute(self):
         print("Execute Save Command")
         save_file(self.game_controller)
 
+    def finish(self, filename):
+        print("Game saved to", filename)
+
+    def fail(self, error):
+        print("Could not save game:", error)
+
 
 class LoadCommand(GameCommand):
     def execute(self):
         print("Execute Load Command")
         load_file(self.game_controller)
 
+    def finish(self, result):
+        filename, (game_board, caretaker) = result
+        self.game_controller.game_model.game_board = game_board
+        self.game_controller.caretaker = caretaker
+        print("Game loaded from", filename)
+        self.game_controller.model_changed()
+
+    def fail(self, error):
+        print("Could not load game:", error)
+
 
 class UndoCommand(GameCommand):
     def execute(self):
         print("Execute Undo Command")
-        current_game_board_memento = self.game_controller.game_model.save_to_memento()
-        undo_game_board_memento = self.game_controller.caretaker.get_undo_memento(current_game_board_memento)
+        self.game_controller.jobs.cancel(Actions.AI)
+        undo_game_board_memento = self.game_controller.caretaker.get_undo_memento()
         if undo_game_board_memento:
             self.game_controller.game_model.restore_from_memento(undo_game_board_memento)
-            self.game_controller.game_model.game_board.reset_valid_moves()
-            self.game_controller.game_view.update()
+            self.game_controller.model_changed()
+            self.game_controller.update_view()
             print("Undo successful!")
-        print("Nothing to undo!")
+        else:
+            print("Nothing to undo!")
 
 
 class RedoCommand(GameCommand):
     def execute(self):
         print("Execute Redo Command")
-        current_game_board_memento = self.game_controller.game_model.save_to_memento()
-        redo_game_board_memento = self.game_controller.caretaker.get_redo_memento(current_game_board_memento)
+        self.game_controller.jobs.cancel(Actions.AI)
+        redo_game_board_memento = self.game_controller.caretaker.get_redo_memento()
         if redo_game_board_memento:
-            self.game_controller.game_model.restore_from_memento(redo_game_board_memento)
+            self.game_controller.game_model.replay_memento(redo_game_board_memento)
+            self.game_controller.model_changed()
+            self.game_controller.update_view()
             print("Redo successful!")
-        print("Nothing to redo!")
+        else:
+            print("Nothing to redo!")
+
+
+class SeekCommand(GameCommand):
+    def execute(self):
+        self.game_controller.jobs.cancel(Actions.AI)
+        caretaker = self.game_controller.caretaker
+        game_model = self.game_controller.game_model
+        ply = max(0, min(self.game_controller.seek_ply, len(caretaker)))
+        if ply == caretaker.get_cursor():
+            return
+        print(f"Execute Seek Command to ply {ply}")
+        # Nearby plies are reached through the mementos, anything further is rebuilt from the nearest checkpoint
+        if abs(ply - caretaker.get_cursor()) < HistorySettings.CHECKPOINT_INTERVAL:
+            while caretaker.get_cursor() > ply:
+                game_model.restore_from_memento(caretaker.get_undo_memento())
+            while caretaker.get_cursor() < ply:
+                game_model.replay_memento(caretaker.get_redo_memento())
+        else:
+            game_model.restore_position(*caretaker.get_position(ply))
+            caretaker.set_cursor(ply)
+        game_model.game_board.reset_valid_moves()
+        self.game_controller.model_changed()
+
+
+class BranchCommand(GameCommand):
+    def execute(self):
+        # The board stays where it is, only the moves after it are swapped for the other line
+        self.game_controller.jobs.cancel(Actions.AI)
+        caretaker = self.game_controller.caretaker
+        if caretaker.switch_branch(caretaker.get_cursor()):
+            print(f"Switched to another line at ply {caretaker.get_cursor()}")
+            self.game_controller.model_changed()
+        else:
+            print("No other line at this ply!")
 
 
 class MoveCommand(GameCommand):
     def execute(self):
+        # The computer's pieces stay put while it thinks
+        if self.game_controller.is_ai_to_move():
+            return
         row, col = self.game_controller.mouse_position
-        self.game_controller.save_state()
-        success = self.game_controller.game_model.game_board.select(row, col)
+        game_board = self.game_controller.game_model.game_board
+        with self.game_controller.instrumentation.measure('move_generation'):
+            game_board.all_legal_moves()
+        success = game_board.select(row, col)
+        # Even without a move the selection and its valid moves may have changed
+        self.game_controller.model_changed()
         if success:
             print("Execute Move Command")
-        else:
-            self.game_controller.caretaker.remove_memento()
+            self.game_controller.save_state()
+
+
+class AIMoveCommand(GameCommand):
+    def __init__(self, game_controller):
+        super().__init__(game_controller)
+        # A cancelled search may still be unwinding when the next one starts, and both share one search object
+        self._search_lock = threading.Lock()
+
+    def execute(self):
+        if self.game_controller.jobs.is_active(Actions.AI):
+            return
+        game_board = copy.deepcopy(self.game_controller.game_model.game_board)
+        self.game_controller.jobs.submit(Actions.AI, self.search, game_board)
+
+    def search(self, job, game_board):
+        with self._search_lock, self.game_controller.instrumentation.measure('search'):
+            return game_board.get_hash(), self.game_controller.search.search(game_board, job.report_progress, job.is_cancelled)
+
+    def progress(self, result):
+        self.game_controller.game_view.set_status(f"Depth {result.depth}")
+
+    def finish(self, result):
+        position_hash, result = result
+        game_board = self.game_controller.game_model.game_board
+        if position_hash != game_board.get_hash():
+            return
+        if result.move is None:
+            print("AI has no move!")
+            return
+        origin, destination = result.move
+        game_board.reset_valid_moves()
+        game_board.select(*origin)
+        if game_board.select(*destination):
+            print(f"Execute AI Move Command {origin} -> {destination} (depth {result.depth}, {result.nodes} nodes, {result.elapsed:.2f}s)")
+            self.game_controller.save_state()
+            self.game_controller.model_changed()
 
 
 class GameController:
-    def __init__(self):
-        self.game_model = GameModel()
+    def __init__(self, ai_color=None, ai_time_budget=SearchSettings.TIME_BUDGET, event_driven=Settings.EVENT_DRIVEN, instrumentation=None, variant=CLASSIC):
+        self.game_model = GameModel(variant=variant)
         self.game_view = GameView(self)
         self.mouse_position = (0, 0)
+        self.seek_ply = 0
         self.run = True
+        self.event_driven = event_driven
+        self._model_changed = True
 
-        self.caretaker = Caretaker()
+        self.ai_color = ai_color
+        self.search = AlphaBetaSearch(ai_time_budget, opening_book=load_book(), tablebase=load_tablebase())
 
-        self.save_state()
+        self.caretaker = Caretaker(self.game_model.game_board.get_position(), variant)
+        self.instrumentation = instrumentation if instrumentation else Instrumentation()
+        self.jobs = JobManager(self.post_job_event, call=self.instrumentation.profile_call)
 
         self.commands = {
             Actions.SAVE: SaveCommand(self),
             Actions.UNDO: UndoCommand(self),
             Actions.REDO: RedoCommand(self),
             Actions.LOAD: LoadCommand(self),
-            Actions.MOVE: MoveCommand(self)
+            Actions.MOVE: MoveCommand(self),
+            Actions.AI: AIMoveCommand(self),
+            Actions.SEEK: SeekCommand(self),
+            Actions.BRANCH: BranchCommand(self)
         }
 
     def save_state(self):
-        game_board_memento = self.game_model.save_to_memento()
-        self.caretaker.add_memento(game_board_memento)
+        with self.instrumentation.measure('memento'):
+            game_board_memento = self.game_model.save_to_memento()
+            self.caretaker.add_memento(game_board_memento)
+
+    def post_job_event(self, job, status, value):
+        pygame.event.post(pygame.event.Event(JOB_EVENT, job=job, status=status, value=value))
+
+    def handle_job_event(self, event):
+        command = self.commands[event.job.name]
+        if event.status == JobStatus.PROGRESS:
+            if self.jobs.is_current(event.job):
+                command.progress(event.value)
+                self.model_changed()
+            return
+        if not self.jobs.finish(event.job):
+            return
+        self.game_view.set_status(None)
+        if event.status == JobStatus.DONE:
+            command.finish(event.value)
+        elif event.status == JobStatus.FAILED:
+            command.fail(event.value)
+        self.model_changed()
+
+    def dispatch(self, action):
+        with self.instrumentation.measure('command.' + action):
+            self.commands[action].execute()
+
+    def update_view(self):
+        with self.instrumentation.measure('view.update'):
+            self.game_view.update()
 
     def end_game(self):
         self.run = False
 
+    def model_changed(self):
+        self._model_changed = True
+
+    def is_ai_to_move(self):
+        game_board = self.game_model.game_board
+        return self.ai_color is not None and game_board.get_turn() == self.ai_color and not game_board.winner()
+
+    def is_ai_turn(self):
+        # The computer waits while earlier positions of the game are being looked at
+        return self.is_ai_to_move() and self.caretaker.get_cursor() == len(self.caretaker)
+
+    def seek(self, ply):
+        self.seek_ply = ply
+        self.dispatch(Actions.SEEK)
+
     def run_game(self):
+        if self.event_driven:
+            self.run_event_loop()
+        else:
+            self.run_polling_loop()
+
+        self.jobs.shutdown()
+        self.instrumentation.close()
+        pygame.quit()
+
+    def run_event_loop(self):
+        # Mouse motion would wake the loop without ever changing the game
+        pygame.event.set_blocked(pygame.MOUSEMOTION)
+
+        while self.run:
+
+            if self._model_changed:
+                self._model_changed = False
+
+                # Caps the frame rate while commands keep changing the model
+                self.game_view.tick()
+                self.update_view()
+
+                if self.game_model.game_board.winner():
+                    self.game_view.display_winner()
+                    self.end_game()
+                    break
+
+                if self.is_ai_turn():
+                    self.dispatch(Actions.AI)
+                    continue
+
+            for event in [pygame.event.wait(Settings.IDLE_TIMEOUT)] + pygame.event.get():
+                self.handle_event(event)
+
+    def run_polling_loop(self):
 
         while self.run:
 
@@ -101,30 +303,58 @@ class GameController:
                 self.end_game()
 
             for event in pygame.event.get():
+                self.handle_event(event)
 
-                if event.type == pygame.QUIT:
-                    self.run = False
+            if self.run and self.is_ai_turn():
+                self.update_view()
+                self.dispatch(Actions.AI)
 
-                if event.type == pygame.MOUSEBUTTONDOWN:
+            self.update_view()
 
-                    mouse_position = pygame.mouse.get_pos()
-                    click_type, self.mouse_position = self.get_click(mouse_position)
+    def handle_event(self, event):
 
-                    if click_type in self.commands:
-                        command = self.commands[click_type]
-                        command.execute()
+        if event.type == pygame.QUIT:
+            self.run = False
 
-            self.game_view.update()
+        if event.type == pygame.MOUSEBUTTONDOWN:
 
-        pygame.quit()
+            mouse_position = pygame.mouse.get_pos()
+            click_type, self.mouse_position = self.get_click(mouse_position)
+
+            if click_type in self.commands:
+                self.dispatch(click_type)
+
+        if event.type == JOB_EVENT:
+            self.handle_job_event(event)
+
+        if event.type == pygame.KEYDOWN:
+            self.handle_key(event.key)
+
+        if event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+            self.game_view.invalidate()
+            self.model_changed()
+
+    def handle_key(self, key):
+        if key == pygame.K_F12:
+            self.instrumentation.dump()
+        elif key == pygame.K_LEFT:
+            self.dispatch(Actions.UNDO)
+        elif key == pygame.K_RIGHT:
+            self.dispatch(Actions.REDO)
+        elif key == pygame.K_HOME:
+            self.seek(0)
+        elif key == pygame.K_END:
+            self.seek(len(self.caretaker))
+        elif key == pygame.K_b:
+            self.dispatch(Actions.BRANCH)
 
     def get_click(self, position):
         x, y = position
 
         # Check if click is on the board
         if 0 <= x < BoardSettings.WIDTH and 0 <= y < BoardSettings.HEIGHT:
-            col = x // BoardSettings.CELL_SIZE
-            row = y // BoardSettings.CELL_SIZE
+            col = x // self.game_view.get_cell_size()
+            row = y // self.game_view.get_cell_size()
             return Actions.MOVE, (row, col)
 
         # Check if click is on any button
@@ -132,6 +362,11 @@ class GameController:
             if button.is_over(position):
                 return button_name, (0, 0)
 
+        # Check if click is on the timeline
+        if self.game_view.get_timeline_rect().collidepoint(position):
+            self.seek_ply = self.game_view.get_timeline_ply(x, len(self.caretaker))
+            return Actions.SEEK, (0, 0)
+
         # Undefined
         return 'none', (None, None)
 
@@ -141,20 +376,19 @@ def save_file(game_controller):
     root.withdraw()
 
     filename = filedialog.asksaveasfilename(
-        defaultextension=".pkl",
-        filetypes=[("Pickle files", "*.pkl"), ("All files", "*.*")],
+        defaultextension=SaveSettings.EXTENSION,
+        filetypes=[("Dame files", "*" + SaveSettings.EXTENSION), ("PDN files", "*" + PdnSettings.EXTENSION), ("All files", "*.*")],
         title="Save Game"
     )
 
     if filename:
-        with open(filename, "wb") as file:
-            saved_state = {
-                "game_board": copy.deepcopy(game_controller.game_model.game_board),
-                "undo_stack": copy.deepcopy(game_controller.caretaker.get_undo_stack()),
-                "redo_stack": copy.deepcopy(game_controller.caretaker.get_redo_stack())
-            }
-            pickle.dump(saved_state, file)
-        print("Game saved to", filename)
+        # Encoding is quick and must see a consistent game, only the write runs in the background
+        game_board, caretaker = game_controller.game_model.game_board, game_controller.caretaker
+        if filename.lower().endswith(PdnSettings.EXTENSION):
+            data = export_game(game_board, caretaker).encode()
+        else:
+            data = encode_game(game_board, caretaker)
+        game_controller.jobs.submit(Actions.SAVE, write_file, filename, data)
     else:
         print("Save operation cancelled.")
 
@@ -164,21 +398,28 @@ def load_file(game_controller):
     root.withdraw()
 
     filename = filedialog.askopenfilename(
-        defaultextension=".pkl",
-        filetypes=[("Pickle files", "*.pkl"), ("All files", "*.*")],
+        defaultextension=SaveSettings.EXTENSION,
+        filetypes=[("Dame files", "*" + SaveSettings.EXTENSION), ("PDN files", "*" + PdnSettings.EXTENSION), ("All files", "*.*")],
         title="Load Game"
     )
 
     if filename:
         if os.path.exists(filename):
-            with open(filename, "rb") as file:
-                loaded_state = pickle.load(file)
-                game_controller.game_model.game_board = loaded_state["game_board"]
-                game_controller.caretaker.set_undo_stack(loaded_state["undo_stack"])
-                game_controller.caretaker.set_redo_stack(loaded_state["redo_stack"])
-            print("Game loaded from", filename)
-            game_controller.game_view.update()
+            game_controller.jobs.cancel(Actions.AI)
+            game_controller.jobs.submit(Actions.LOAD, read_file, filename)
         else:
             print("No saved game found.")
     else:
-        print("Load operation cancelled.")
\ No newline at end of file
+        print("Load operation cancelled.")
+
+
+def write_file(job, filename, data):
+    with open(filename, "wb") as file:
+        file.write(data)
+    return filename
+
+
+def read_file(job, filename):
+    if filename.lower().endswith(PdnSettings.EXTENSION):
+        return filename, load_pdn(filename)
+    return filename, replay_game(load_game(filename, mapped=True))
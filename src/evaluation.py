@@ -0,0 +1,95 @@
+from constants import BoardSettings, Colors, Direction, EvaluationSettings
+from bitboard import BitboardGameBoard, NEIGHBOURS, Squares, KING_STEP_MASKS, SQUARE_BITS, STEP_MASKS, iterate_squares, square_position
+
+
+ROW_MASKS = [sum(SQUARE_BITS[square] for square in range(Squares.COUNT) if square_position(square)[0] == row) for row in range(BoardSettings.ROWS)]
+
+
+def evaluate(game_board):
+    if isinstance(game_board, BitboardGameBoard):
+        return evaluate_bit_board(game_board.get_bit_board())
+    score = 0
+    variant = game_board.get_variant()
+    for row in range(variant.rows):
+        for col in range(variant.cols):
+            piece = game_board.get_field(row, col)
+            if piece == BoardSettings.EMPTY_FIELD:
+                continue
+            if piece.is_king():
+                value = EvaluationSettings.KING_VALUE
+                directions = Direction.ALL
+            else:
+                advancement = variant.rows - 1 - row if piece.color == Colors.RED else row
+                value = EvaluationSettings.MAN_VALUE + EvaluationSettings.ADVANCEMENT_VALUE * advancement
+                if advancement == 0:
+                    value += EvaluationSettings.BACK_RANK_VALUE
+                directions = Direction.UP if piece.color == Colors.RED else Direction.DOWN
+            for direction in directions:
+                neighbour = variant.neighbours[row][col][direction]
+                if neighbour and game_board.get_field(*neighbour) == BoardSettings.EMPTY_FIELD:
+                    value += EvaluationSettings.MOBILITY_VALUE
+            score += value if piece.color == Colors.RED else -value
+    return score if game_board.get_turn() == Colors.RED else -score
+
+
+def evaluate_bit_board(bit_board):
+    # The same terms as evaluate, counted on the masks
+    empty = ~(bit_board.red | bit_board.white) & Squares.FULL_MASK
+    score = 0
+    for color, own in [(Colors.RED, bit_board.red), (Colors.WHITE, bit_board.white)]:
+        men, kings = own & ~bit_board.kings, own & bit_board.kings
+        value = EvaluationSettings.MAN_VALUE * men.bit_count() + EvaluationSettings.KING_VALUE * kings.bit_count()
+        for row, row_mask in enumerate(ROW_MASKS):
+            advancement = BoardSettings.ROWS - 1 - row if color == Colors.RED else row
+            value += EvaluationSettings.ADVANCEMENT_VALUE * advancement * (men & row_mask).bit_count()
+            if advancement == 0:
+                value += EvaluationSettings.BACK_RANK_VALUE * (men & row_mask).bit_count()
+        step_masks = STEP_MASKS[color]
+        for square in iterate_squares(men):
+            value += EvaluationSettings.MOBILITY_VALUE * (step_masks[square] & empty).bit_count()
+        for square in iterate_squares(kings):
+            value += EvaluationSettings.MOBILITY_VALUE * (KING_STEP_MASKS[square] & empty).bit_count()
+        score += value if color == Colors.RED else -value
+    return score if bit_board.turn == Colors.RED else -score
+
+
+def encode_positions(bit_boards):
+    np = require_numpy()
+    return np.array([(bit_board.red, bit_board.white, bit_board.kings, 0 if bit_board.turn == Colors.RED else 1) for bit_board in bit_boards], dtype=np.int64).reshape(-1, 4)
+
+
+def evaluate_batch(positions):
+    # positions: (N, 4) array of red, white and king masks plus the side to move (0 red, 1 white)
+    np = require_numpy()
+    positions = np.asarray(positions, dtype=np.int64).reshape(-1, 4)
+    squares = ((positions[:, :3, None] >> np.arange(Squares.COUNT)) & 1).astype(bool)
+    red, white, kings = squares[:, 0], squares[:, 1], squares[:, 2]
+    red_men, white_men = red & ~kings, white & ~kings
+    red_kings, white_kings = red & kings, white & kings
+
+    rows = np.array([square_position(square)[0] for square in range(Squares.COUNT)])
+    red_advancement = BoardSettings.ROWS - 1 - rows
+    score = EvaluationSettings.MAN_VALUE * (red_men.sum(axis=1) - white_men.sum(axis=1))
+    score += EvaluationSettings.KING_VALUE * (red_kings.sum(axis=1) - white_kings.sum(axis=1))
+    score += EvaluationSettings.ADVANCEMENT_VALUE * ((red_men * red_advancement).sum(axis=1) - (white_men * rows).sum(axis=1))
+    score += EvaluationSettings.BACK_RANK_VALUE * ((red_men & (red_advancement == 0)).sum(axis=1) - (white_men & (rows == 0)).sum(axis=1))
+
+    empty = ~(red | white)
+    for direction in Direction.ALL:
+        neighbours = np.array(NEIGHBOURS[direction])
+        sources = np.nonzero(neighbours >= 0)[0]
+        open_squares = empty[:, neighbours[sources]]
+        red_movers = red[:, sources] if direction in Direction.UP else red_kings[:, sources]
+        white_movers = white[:, sources] if direction in Direction.DOWN else white_kings[:, sources]
+        score += EvaluationSettings.MOBILITY_VALUE * ((red_movers & open_squares).sum(axis=1) - (white_movers & open_squares).sum(axis=1))
+
+    return np.where(positions[:, 3] == 0, score, -score)
+
+
+def require_numpy():
+    # Deferred until the batch path runs so the search and headless workers never load NumPy
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("evaluate_batch needs NumPy, install it with 'pip install numpy'") from None
+    return numpy
@@ -0,0 +1,149 @@
+from constants import InstrumentationSettings
+import cProfile
+import json
+import pstats
+import threading
+import time
+import tracemalloc
+
+
+class Histogram:
+    # Power-of-two buckets in microseconds: bucket i holds samples shorter than 2**i us
+    def __init__(self):
+        self.buckets = [0] * InstrumentationSettings.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.minimum = None
+        self.maximum = 0.0
+
+    def record(self, seconds):
+        bucket = min(int(seconds * 1000000).bit_length(), InstrumentationSettings.BUCKETS - 1)
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total += seconds
+        self.minimum = seconds if self.minimum is None else min(self.minimum, seconds)
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, fraction):
+        # Upper bound of the bucket holding the sample, capped by the slowest sample seen
+        threshold, seen = fraction * self.count, 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= threshold:
+                return min(2 ** bucket / 1000000, self.maximum)
+        return self.maximum
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'mean_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'min_ms': round((self.minimum or 0.0) * 1000, 3),
+            'max_ms': round(self.maximum * 1000, 3),
+            'p50_ms': round(self.percentile(0.5) * 1000, 3),
+            'p90_ms': round(self.percentile(0.9) * 1000, 3),
+            'p99_ms': round(self.percentile(0.99) * 1000, 3),
+            'buckets_us': {f"<{2 ** bucket}": count for bucket, count in enumerate(self.buckets) if count}
+        }
+
+
+class NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Timer:
+    def __init__(self, histogram):
+        self._histogram = histogram
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._histogram.record(time.perf_counter() - self._start)
+        return False
+
+
+class Instrumentation:
+    def __init__(self, enabled=InstrumentationSettings.ENABLED, profile=False, trace_memory=False, output=InstrumentationSettings.OUTPUT):
+        self.enabled = enabled or profile or trace_memory
+        self.output = output
+        self.histograms = {}
+        # Jobs measure and profile from pool threads while the main thread may be dumping
+        self._lock = threading.Lock()
+        self._job_stats = None
+        self._profiler = None
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(InstrumentationSettings.TRACE_FRAMES)
+        self._trace_memory = trace_memory
+
+    def measure(self, name):
+        if not self.enabled:
+            return NULL_TIMER
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram())
+        return Timer(histogram)
+
+    def profile_call(self, function, *args):
+        # cProfile only sees the thread that enabled it, so work on job threads gets a profiler of its own
+        if not self._profiler:
+            return function(*args)
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args)
+        finally:
+            with self._lock:
+                if self._job_stats is None:
+                    self._job_stats = pstats.Stats(profiler)
+                else:
+                    self._job_stats.add(profiler)
+
+    def get_histograms(self):
+        with self._lock:
+            return sorted(self.histograms.items())
+
+    def report(self):
+        return {name: histogram.to_dict() for name, histogram in self.get_histograms()}
+
+    def dump(self):
+        if not self.enabled:
+            return
+        with open(self.output + '.json', 'w') as file:
+            json.dump(self.report(), file, indent=2)
+        if self._profiler:
+            self._profiler.disable()
+            stats = pstats.Stats(self._profiler)
+            with self._lock:
+                if self._job_stats is not None:
+                    stats.add(self._job_stats)
+            stats.dump_stats(self.output + '.prof')
+            self._profiler.enable()
+        if self._trace_memory:
+            statistics = tracemalloc.take_snapshot().statistics('lineno')[:InstrumentationSettings.TOP_ALLOCATIONS]
+            with open(self.output + '.memory.txt', 'w') as file:
+                file.writelines(f"{statistic}\n" for statistic in statistics)
+
+        for name, histogram in self.get_histograms():
+            summary = histogram.to_dict()
+            print(f"  {name:<24} {summary['count']:>7} calls  mean {summary['mean_ms']:>9.3f}ms  p99 {summary['p99_ms']:>9.3f}ms  max {summary['max_ms']:>9.3f}ms")
+        print("Metrics written to", self.output + '.*')
+
+    def close(self):
+        self.dump()
+        if self._profiler:
+            self._profiler.disable()
+        if self._trace_memory:
+            tracemalloc.stop()
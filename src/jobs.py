@@ -0,0 +1,100 @@
+from constants import JobSettings
+from concurrent.futures import ThreadPoolExecutor
+import itertools
+import threading
+
+
+class JobStatus:
+    PROGRESS = 'progress'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, job_id, name, manager):
+        self.id = job_id
+        self.name = name
+        self._manager = manager
+        self._cancelled = threading.Event()
+        self.future = None
+
+    def cancel(self):
+        self._cancelled.set()
+        if self.future:
+            self.future.cancel()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def check_cancelled(self):
+        if self.is_cancelled():
+            raise JobCancelled()
+
+    def report_progress(self, progress):
+        if not self.is_cancelled():
+            self._manager.post(self, JobStatus.PROGRESS, progress)
+
+
+class JobManager:
+    # Work runs on pool threads; results come back through post(job, status, value), which must be
+    # safe to call from any thread, and are only acted on once the main thread calls finish(job)
+    def __init__(self, post, workers=JobSettings.WORKERS, call=None):
+        # call(function, *args) runs each job's function when given, e.g. to profile it on its thread
+        self._post = post
+        self._call = call
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._ids = itertools.count(1)
+
+    def submit(self, name, function, *args):
+        # function(job, *args) runs in the pool, it should call job.check_cancelled() now and then
+        self.cancel(name)
+        job = Job(next(self._ids), name, self)
+        self._jobs[name] = job
+        job.future = self._executor.submit(self.run, job, function, args)
+        return job
+
+    def run(self, job, function, args):
+        try:
+            result = self._call(function, job, *args) if self._call else function(job, *args)
+            job.check_cancelled()
+        except JobCancelled:
+            self.post(job, JobStatus.CANCELLED, None)
+        except Exception as error:
+            self.post(job, JobStatus.FAILED, error)
+        else:
+            self.post(job, JobStatus.DONE, result)
+
+    def post(self, job, status, value):
+        self._post(job, status, value)
+
+    def finish(self, job):
+        # Returns whether the job is still the current one of its name, stale results are dropped
+        if self._jobs.get(job.name) is not job:
+            return False
+        del self._jobs[job.name]
+        return True
+
+    def is_active(self, name):
+        return name in self._jobs
+
+    def is_current(self, job):
+        return self._jobs.get(job.name) is job
+
+    def cancel(self, name):
+        job = self._jobs.pop(name, None)
+        if job:
+            job.cancel()
+
+    def cancel_all(self):
+        for name in list(self._jobs):
+            self.cancel(name)
+
+    def shutdown(self):
+        self.cancel_all()
+        self._executor.shutdown(wait=True, cancel_futures=True)
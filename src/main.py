@@ -1,8 +1,25 @@
 from controller import GameController
+from constants import Colors, InstrumentationSettings, SearchSettings, VariantSettings
+from instrumentation import Instrumentation
+from model import VARIANTS
+import argparse
+
+AI_COLORS = {'red': Colors.RED, 'white': Colors.WHITE}
 
 def main():
-    game_controller = GameController()
+    parser = argparse.ArgumentParser(description='Dame')
+    parser.add_argument('--ai', choices=AI_COLORS, help='let the computer play this side')
+    parser.add_argument('--variant', choices=VARIANTS, default=VariantSettings.DEFAULT, help='rules to play: the original classic ones, English checkers or 10x10 international draughts')
+    parser.add_argument('--ai-time', type=float, default=SearchSettings.TIME_BUDGET, help='seconds the computer may think per move')
+    parser.add_argument('--instrument', action='store_true', help='time commands, move generation and frames; F12 or quitting writes the histograms')
+    parser.add_argument('--profile', action='store_true', help='also run cProfile and write its stats next to the histograms')
+    parser.add_argument('--trace-memory', action='store_true', help='also trace allocations with tracemalloc and write the largest sites')
+    parser.add_argument('--metrics-output', default=InstrumentationSettings.OUTPUT, help='path prefix of the metrics files')
+    args = parser.parse_args()
+
+    instrumentation = Instrumentation(args.instrument, args.profile, args.trace_memory, args.metrics_output)
+    game_controller = GameController(AI_COLORS.get(args.ai), args.ai_time, instrumentation=instrumentation, variant=VARIANTS[args.variant])
     game_controller.run_game()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
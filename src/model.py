@@ -1,88 +1,341 @@
-from constants import BoardSettings, Colors, Direction
-import copy
+from constants import BoardSettings, Colors, Direction, HistorySettings
+from zobrist import piece_key, turn_key, WHITE_TO_MOVE_KEY
+import os
+import tempfile
+import zlib
 
 
 class GameBoardMemento:
-    def __init__(self, game_board):
-        self._game_board_state = copy.deepcopy(game_board)
+    def __init__(self, origin, destination, captured, promoted, turn):
+        self._origin = origin
+        self._destination = destination
+        self._captured = captured
+        self._promoted = promoted
+        self._turn = turn
 
-    def get_state(self):
-        return self._game_board_state
+    def get_origin(self):
+        return self._origin
+
+    def get_destination(self):
+        return self._destination
+
+    def get_captured(self):
+        return self._captured
+
+    def is_promotion(self):
+        return self._promoted
+
+    def get_turn(self):
+        return self._turn
 
 
 class Caretaker:
-    def __init__(self):
-        self._undo_stack = []
-        self._redo_stack = []
+    # History is one timeline with a cursor: moves before it can be undone, moves after it redone.
+    # Every CHECKPOINT_INTERVAL-th position is kept packed, so any ply is at most that many deltas away.
+    # Older moves are packed into compressed blocks of CHECKPOINT_INTERVAL moves, each starting with
+    # its checkpoint, and are rebuilt by replaying from that checkpoint when they are needed again.
+    # A move made in the middle of the timeline keeps the old continuation as a branch.
+    def __init__(self, start_position=None, variant=None, memory_limit=HistorySettings.MEMORY_LIMIT, spill_to_disk=HistorySettings.SPILL_TO_DISK):
+        self._start_position = start_position
+        self._variant = variant or CLASSIC
+        self._memory_limit = max(memory_limit, HistorySettings.CHECKPOINT_INTERVAL)
+        self._spill_to_disk = spill_to_disk
+        self._segment = None
+        self._blocks = []
+        self._recent = []
+        self._checkpoints = []
+        self._branches = []
+        self._cursor = 0
+        self._cached_block = (None, None)
+
+    def __len__(self):
+        return len(self._blocks) * HistorySettings.CHECKPOINT_INTERVAL + len(self._recent)
+
+    def get_start_position(self):
+        if self._start_position is None:
+            self._start_position = GameBoard(self._variant).get_position()
+        return self._start_position
+
+    def get_variant(self):
+        return self._variant
+
+    def get_cursor(self):
+        return self._cursor
+
+    def set_cursor(self, ply):
+        self._cursor = max(0, min(ply, len(self)))
+
+    def get_memento(self, ply):
+        recent_start = len(self._blocks) * HistorySettings.CHECKPOINT_INTERVAL
+        if ply >= recent_start:
+            return self._recent[ply - recent_start]
+        _, mementos = self.load_block(ply // HistorySettings.CHECKPOINT_INTERVAL)
+        return mementos[ply % HistorySettings.CHECKPOINT_INTERVAL]
+
+    def get_position(self, ply):
+        pieces, turn = self.position_at(ply)
+        return tuple((row, col, color, king) for (row, col), (color, king) in sorted(pieces.items())), turn
+
+    def position_at(self, ply):
+        if not self._checkpoints:
+            # Nothing has been played yet
+            return position_from_pieces(*self.get_start_position())
+        index = ply // HistorySettings.CHECKPOINT_INTERVAL
+        position = decode_position(self._checkpoints[index], self._variant)[0]
+        for step in range(index * HistorySettings.CHECKPOINT_INTERVAL, ply):
+            advance_position(position, self.get_memento(step))
+        return position
 
     def get_undo_stack(self):
-        return self._undo_stack
+        return [self.get_memento(ply) for ply in range(self._cursor)]
 
     def get_redo_stack(self):
-        return self._redo_stack
-
-    def set_undo_stack(self, undo_stack):
-        self._undo_stack = undo_stack
+        return [self.get_memento(ply) for ply in reversed(range(self._cursor, len(self)))]
 
     def set_redo_stack(self, redo_stack):
-        self._redo_stack = redo_stack
+        self.truncate(self._cursor)
+        self.extend(reversed(redo_stack))
 
     def add_memento(self, memento):
-        self._undo_stack.append(memento)
-        self._redo_stack.clear()
-
-    def remove_memento(self):
-        self._undo_stack.pop()
-
-    def get_undo_memento(self, current_game_board_memento):
-        if len(self._undo_stack) > 1:
-            self._redo_stack.append(copy.deepcopy(current_game_board_memento))
-            undo_game_board_memento = self._undo_stack.pop()
-            return undo_game_board_memento
+        self.save_branch(self._cursor)
+        self.truncate(self._cursor)
+        self.extend([memento])
+        self._cursor += 1
+
+    def get_undo_memento(self):
+        if self._cursor > 0:
+            self._cursor -= 1
+            return self.get_memento(self._cursor)
         return None
 
-    def get_redo_memento(self, current_game_board_memento):
-        if self._redo_stack:
-            redo_game_board_memento = self._redo_stack.pop()
-            self._undo_stack.append(copy.deepcopy(current_game_board_memento))
-            return redo_game_board_memento
+    def get_redo_memento(self):
+        if self._cursor < len(self):
+            self._cursor += 1
+            return self.get_memento(self._cursor - 1)
         return None
 
+    def get_branches(self):
+        return [ply for ply, _ in self._branches]
+
+    def save_branch(self, ply):
+        if ply >= len(self):
+            return
+        mementos = [self.get_memento(step) for step in range(ply, len(self))]
+        self._branches.append((ply, zlib.compress(encode_block(self.position_at(ply), mementos, self._variant), HistorySettings.COMPRESSION_LEVEL)))
+        del self._branches[:-HistorySettings.MAX_BRANCHES]
+
+    def switch_branch(self, ply):
+        # Swaps the continuation after ply for the oldest branch leaving that same position, the current one becomes a branch
+        if not self._branches or ply >= len(self):
+            return False
+        checkpoint = encode_position(self.position_at(ply), self._variant)
+        for index, (branch_ply, data) in enumerate(self._branches):
+            if branch_ply != ply:
+                continue
+            data = zlib.decompress(data)
+            if not data.startswith(checkpoint):
+                continue
+            del self._branches[index]
+            self.save_branch(ply)
+            self.truncate(ply)
+            self.extend(decode_block(data, self._variant)[1])
+            self._cursor = ply
+            return True
+        return False
+
+    def extend(self, mementos):
+        self._recent.extend(mementos)
+        self.update_checkpoints()
+        self.spill()
+
+    def update_checkpoints(self):
+        if not self._checkpoints:
+            self._checkpoints.append(encode_position(position_from_pieces(*self.get_start_position()), self._variant))
+        while len(self._checkpoints) * HistorySettings.CHECKPOINT_INTERVAL <= len(self):
+            index = len(self._checkpoints)
+            position = decode_position(self._checkpoints[-1], self._variant)[0]
+            for ply in range((index - 1) * HistorySettings.CHECKPOINT_INTERVAL, index * HistorySettings.CHECKPOINT_INTERVAL):
+                advance_position(position, self.get_memento(ply))
+            self._checkpoints.append(encode_position(position, self._variant))
+
+    def truncate(self, ply):
+        del self._checkpoints[ply // HistorySettings.CHECKPOINT_INTERVAL + 1:]
+        recent_start = len(self._blocks) * HistorySettings.CHECKPOINT_INTERVAL
+        if ply >= recent_start:
+            del self._recent[ply - recent_start:]
+            return
+        # Cutting into packed history brings the block holding the cut back into memory
+        index = ply // HistorySettings.CHECKPOINT_INTERVAL
+        _, mementos = self.load_block(index)
+        self.truncate_segment(self._blocks[index][0])
+        del self._blocks[index:]
+        self._recent = mementos[:ply - index * HistorySettings.CHECKPOINT_INTERVAL]
+        self._cached_block = (None, None)
+
+    def spill(self):
+        while len(self._recent) > self._memory_limit:
+            mementos = self._recent[:HistorySettings.CHECKPOINT_INTERVAL]
+            checkpoint = self._checkpoints[len(self._blocks)]
+            data = zlib.compress(checkpoint + encode_moves(mementos, self._variant), HistorySettings.COMPRESSION_LEVEL)
+            self._blocks.append(self.write_segment(data))
+            del self._recent[:HistorySettings.CHECKPOINT_INTERVAL]
+
+    def load_block(self, index):
+        if self._cached_block[0] != index:
+            offset, length = self._blocks[index]
+            self._cached_block = (index, decode_block(zlib.decompress(self.read_segment(offset, length)), self._variant))
+        return self._cached_block[1]
+
+    def write_segment(self, data):
+        if self._segment is None:
+            self._segment = tempfile.TemporaryFile() if self._spill_to_disk else bytearray()
+        if self._spill_to_disk:
+            offset = self._segment.seek(0, os.SEEK_END)
+            self._segment.write(data)
+        else:
+            offset = len(self._segment)
+            self._segment.extend(data)
+        return offset, len(data)
+
+    def read_segment(self, offset, length):
+        if self._spill_to_disk:
+            self._segment.seek(offset)
+            return self._segment.read(length)
+        return bytes(self._segment[offset:offset + length])
+
+    def truncate_segment(self, offset):
+        if self._segment is None:
+            return
+        if self._spill_to_disk:
+            self._segment.truncate(offset)
+        else:
+            del self._segment[offset:]
+
+
+def position_from_pieces(pieces, turn):
+    return {(row, col): (color, king) for row, col, color, king in pieces}, turn
+
+
+def advance_position(position, memento):
+    # Applies the move in place, a memento carries everything it changes
+    pieces, _ = position
+    color, king = pieces.pop(memento.get_origin())
+    for row, col, _, _ in memento.get_captured():
+        del pieces[(row, col)]
+    pieces[memento.get_destination()] = (color, king or memento.is_promotion())
+    position[1] = Colors.WHITE if memento.get_turn() == Colors.RED else Colors.RED
+
+
+def encode_position(position, variant):
+    # One byte per piece: its dark square, 0x40 for white, 0x80 for a king
+    pieces, turn = position
+    data = bytearray((0 if turn == Colors.RED else 1, len(pieces)))
+    data.extend(variant.square_index(row, col) | (0x40 if color == Colors.WHITE else 0) | (0x80 if king else 0) for (row, col), (color, king) in sorted(pieces.items()))
+    return bytes(data)
+
+
+def decode_position(data, variant):
+    # Returns the position as a mutable [pieces, turn] pair and the number of bytes it took
+    turn, count = Colors.RED if data[0] == 0 else Colors.WHITE, data[1]
+    pieces = {variant.square_position(code & 0x3f): (Colors.WHITE if code & 0x40 else Colors.RED, bool(code & 0x80)) for code in data[2:2 + count]}
+    return [pieces, turn], 2 + count
+
+
+def encode_moves(mementos, variant):
+    # Two bytes per move, the rest of a move is rebuilt by replaying it
+    data = bytearray()
+    for memento in mementos:
+        data.extend((variant.square_index(*memento.get_origin()), variant.square_index(*memento.get_destination())))
+    return bytes(data)
+
+
+def encode_block(position, mementos, variant):
+    return encode_position(position, variant) + encode_moves(mementos, variant)
+
+
+def decode_block(data, variant):
+    position, offset = decode_position(data, variant)
+    pieces, turn = position
+    game_board = GameBoard(variant)
+    game_board.set_position([(row, col, color, king) for (row, col), (color, king) in pieces.items()], turn)
+    mementos = []
+    for offset in range(offset, len(data), 2):
+        origin, destination = variant.square_position(data[offset]), variant.square_position(data[offset + 1])
+        captured = game_board.all_legal_moves()[origin][destination]
+        mementos.append(game_board.make_move(game_board.get_field(*origin), *destination, captured))
+    return position, mementos
+
 
 class GameModel:
 
-    def __init__(self):
-        self.game_board = GameBoard()
+    def __init__(self, game_board_class=None, variant=None):
+        self.game_board = game_board_class() if game_board_class else GameBoard(variant)
 
     def save_to_memento(self):
-        return GameBoardMemento(copy.deepcopy(self.game_board))
+        return self.game_board.get_last_move()
 
     def restore_from_memento(self, memento):
-        self.game_board = memento.get_state()
+        self.game_board.revert_move(memento)
+
+    def replay_memento(self, memento):
+        self.game_board.replay_move(memento)
+
+    def restore_position(self, pieces, turn):
+        self.game_board.set_position(pieces, turn)
 
 
 class GameBoard:
-    def __init__(self):
+    def __init__(self, variant=None):
+        self._variant = variant or CLASSIC
         self._board = []
         self._turn = Colors.RED
-        self._red_left, self._white_left = 12, 12
+        self._red_left = self._white_left = self._variant.get_piece_count()
         self._selected = None
         self._valid_moves = {}
+        self._legal_moves = None
+        self._last_move = None
+        self._hash = 0
         self.create_board()
 
     def create_board(self):
-        for row in range(BoardSettings.ROWS):
+        variant = self._variant
+        for row in range(variant.rows):
             self._board.append([])
-            for col in range(BoardSettings.COLS):
+            for col in range(variant.cols):
                 if col % 2 == ((row + 1) % 2):
-                    if row < 3:
-                        self._board[row].append(Piece(row, col, Colors.WHITE, NormalMoveStrategy()))
-                    elif row > 4:
-                        self._board[row].append(Piece(row, col, Colors.RED, NormalMoveStrategy()))
+                    if row < variant.piece_rows:
+                        self._board[row].append(Piece(row, col, Colors.WHITE, variant.man_strategy))
+                    elif row >= variant.rows - variant.piece_rows:
+                        self._board[row].append(Piece(row, col, Colors.RED, variant.man_strategy))
                     else:
                         self._board[row].append(BoardSettings.EMPTY_FIELD)
                 else:
                     self._board[row].append(BoardSettings.EMPTY_FIELD)
+        self._hash = self.compute_hash()
+
+    def set_position(self, pieces, turn):
+        self._board = [[BoardSettings.EMPTY_FIELD] * self._variant.cols for _ in range(self._variant.rows)]
+        self._red_left, self._white_left = 0, 0
+        self._turn = turn
+        self._hash = turn_key(turn)
+        for row, col, color, king in pieces:
+            self.restore_piece(row, col, color, king)
+        self._selected = None
+        self._valid_moves = {}
+        self._legal_moves = None
+        self._last_move = None
+
+    def get_position(self):
+        pieces = tuple((piece.row, piece.col, piece.color, piece.is_king()) for board_row in self._board for piece in board_row if piece != BoardSettings.EMPTY_FIELD)
+        return pieces, self._turn
+
+    def compute_hash(self):
+        position_hash = turn_key(self._turn)
+        for board_row in self._board:
+            for piece in board_row:
+                if piece != BoardSettings.EMPTY_FIELD:
+                    position_hash ^= piece_key(piece.row, piece.col, piece.color, piece.is_king())
+        return position_hash
 
     def select(self, row, col):
         piece = self.get_piece_or_empty_field(row, col)
@@ -94,10 +347,7 @@ class GameBoard:
     def move_to(self, row, col):
         successful = True
         if (row, col) in self._valid_moves:
-            self.move_piece(self._selected, row, col)
-            if self._valid_moves[(row, col)]:
-                self.remove_pieces(self._valid_moves[(row, col)])
-            self.change_turn()
+            self._last_move = self.make_move(self._selected, row, col, self._valid_moves[(row, col)])
         else:
             successful = False
 
@@ -107,26 +357,79 @@ class GameBoard:
 
     def select_piece(self, piece):
         if piece.color == self._turn:
-            self._valid_moves = piece.get_valid_moves(self._board)
+            self._valid_moves = self.all_legal_moves().get((piece.row, piece.col), {})
             self._selected = None if not self._valid_moves else piece
         return False
 
-    def move_piece(self, piece, row, col):
+    def make_move(self, piece, row, col, captured_pieces):
+        origin = (piece.row, piece.col)
+        was_king = piece.is_king()
+        captured = tuple((captured_piece.row, captured_piece.col, captured_piece.color, captured_piece.is_king()) for captured_piece in captured_pieces)
+        turn = self._turn
+        self.move_piece(piece, row, col)
+        if captured_pieces:
+            self.remove_pieces(captured_pieces)
+        self.change_turn()
+        return GameBoardMemento(origin, (row, col), captured, piece.is_king() and not was_king, turn)
+
+    def revert_move(self, memento):
+        piece = self.get_field(*memento.get_destination())
+        self.relocate_piece(piece, *memento.get_origin())
+        if memento.is_promotion():
+            self._hash ^= piece_key(piece.row, piece.col, piece.color, True) ^ piece_key(piece.row, piece.col, piece.color, False)
+            piece.make_man(self._variant.man_strategy)
+        for row, col, color, king in memento.get_captured():
+            self.restore_piece(row, col, color, king)
+        if self._turn != memento.get_turn():
+            self._hash ^= WHITE_TO_MOVE_KEY
+        self._turn = memento.get_turn()
+        self._selected = None
+        self._valid_moves = {}
+
+    def replay_move(self, memento):
+        piece = self.get_field(*memento.get_origin())
+        captured_pieces = [self.get_field(row, col) for row, col, _, _ in memento.get_captured()]
+        self._last_move = self.make_move(piece, *memento.get_destination(), captured_pieces)
+        self._selected = None
+        self._valid_moves = {}
+
+    def relocate_piece(self, piece, row, col):
+        self._hash ^= piece_key(piece.row, piece.col, piece.color, piece.is_king()) ^ piece_key(row, col, piece.color, piece.is_king())
         self._board[piece.row][piece.col], self._board[row][col] = self._board[row][col], self._board[piece.row][piece.col]
-        piece.calc_pos(row, col)
+        piece.set_position(row, col)
+        self._legal_moves = None
+
+    def restore_piece(self, row, col, color, king):
+        piece = Piece(row, col, color, self._variant.man_strategy)
+        if king:
+            piece.make_king(self._variant.king_strategy)
+        self._board[row][col] = piece
+        self._legal_moves = None
+        self._hash ^= piece_key(row, col, color, king)
+        if color == Colors.RED:
+            self._red_left += 1
+        else:
+            self._white_left += 1
+
+    def move_piece(self, piece, row, col):
+        self.relocate_piece(piece, row, col)
         self.update_king_status(piece, row)
 
     def update_king_status(self, piece, row):
-        if row in [0, BoardSettings.ROWS - 1] and not piece.is_king():
-            piece.make_king()
+        if row in [0, self._variant.rows - 1] and not piece.is_king():
+            self._hash ^= piece_key(piece.row, piece.col, piece.color, False) ^ piece_key(piece.row, piece.col, piece.color, True)
+            piece.make_king(self._variant.king_strategy)
+            self._legal_moves = None
 
     def get_piece_or_empty_field(self, row, col):
         return self._board[row][col]
 
     def remove_pieces(self, pieces):
+        self._legal_moves = None
         for piece in pieces:
             self._board[piece.row][piece.col] = BoardSettings.EMPTY_FIELD
             if piece != 0:
+                self._hash ^= piece_key(piece.row, piece.col, piece.color, piece.is_king())
                 if piece.color == Colors.RED:
                     self._red_left -= 1
                 else:
@@ -134,42 +437,88 @@ class GameBoard:
 
     def change_turn(self):
         self._valid_moves = {}
+        self._legal_moves = None
         self._turn = Colors.WHITE if self._turn == Colors.RED else Colors.RED
+        self._hash ^= WHITE_TO_MOVE_KEY
 
     def winner(self):
-        return Colors.WHITE if self._red_left <= 0 else Colors.RED if self._white_left <= 0 else None
+        if self._red_left <= 0:
+            return Colors.WHITE
+        if self._white_left <= 0:
+            return Colors.RED
+        # A side that cannot move has lost
+        if not self.has_legal_move():
+            return Colors.WHITE if self._turn == Colors.RED else Colors.RED
+        return None
+
+    def all_legal_moves(self):
+        # Computed once per position for the side to move, any change to the board drops it
+        if self._legal_moves is None:
+            legal_moves = {}
+            for piece in self.get_pieces(self._turn):
+                moves = piece.get_valid_moves(self._board)
+                if moves:
+                    legal_moves[(piece.row, piece.col)] = moves
+            self._legal_moves = self._variant.restrict_moves(legal_moves)
+        return self._legal_moves
+
+    def has_legal_move(self):
+        return bool(self.all_legal_moves())
 
     def get_field(self, row, col):
         return self._board[row][col]
 
+    def get_pieces_left(self):
+        return self._red_left, self._white_left
+
+    def get_pieces(self, color):
+        return [field for board_row in self._board for field in board_row if field != BoardSettings.EMPTY_FIELD and field.color == color]
+
     def get_turn(self):
         return self._turn
 
+    def get_variant(self):
+        return self._variant
+
+    def get_hash(self):
+        return self._hash
+
     def get_valid_moves(self):
         return self._valid_moves
 
+    def get_last_move(self):
+        return self._last_move
+
     def reset_valid_moves(self):
         self._valid_moves = {}
 
+    def reset_legal_moves(self):
+        self._legal_moves = None
+
+    def get_board(self):
+        return self._board
+
 
 class Piece:
+    __slots__ = ('row', 'col', 'color', 'move_strategy', '_king')
+
     def __init__(self, row, col, color, move_strategy):
-        self.x, self.y = 0, 0
         self.row, self.col = row, col
         self.color = color
-        self.calc_pos(row, col)
         self.move_strategy = move_strategy
         self._king = False
 
-    def calc_pos(self, row, col):
+    def set_position(self, row, col):
         self.row = row
         self.col = col
-        self.x = BoardSettings.CELL_SIZE * self.col + BoardSettings.CELL_SIZE // 2
-        self.y = BoardSettings.CELL_SIZE * self.row + BoardSettings.CELL_SIZE // 2
 
-    def make_king(self):
+    def make_king(self, move_strategy=None):
         self._king = True
-        self.move_strategy = KingMoveStrategy()
+        self.move_strategy = move_strategy or KING_MOVE_STRATEGY
+
+    def make_man(self, move_strategy=None):
+        self._king = False
+        self.move_strategy = move_strategy or NORMAL_MOVE_STRATEGY
 
     def is_king(self):
         return self._king
@@ -178,74 +527,226 @@ class Piece:
         return self.move_strategy.get_valid_moves(self, board)
 
 
+def build_move_table():
+    def on_board(row, col):
+        return (row, col) if 0 <= row < BoardSettings.ROWS and 0 <= col < BoardSettings.COLS else None
+
+    move_table = []
+    for row in range(BoardSettings.ROWS):
+        move_table.append([])
+        for col in range(BoardSettings.COLS):
+            rays = []
+            for row_step, col_step in Direction.OFFSETS:
+                neighbour = on_board(row + row_step, col + col_step)
+                jump = on_board(row + 2 * row_step, col + 2 * col_step) if neighbour else None
+                # Multi-jumps heading up have never been allowed to land on the first row
+                chain_jump = jump if jump and (row_step == Direction.POSITIVE_STEP or jump[0] > 0) else None
+                rays.append((neighbour, jump, chain_jump))
+            move_table[row].append(tuple(rays))
+    return move_table
+
+
+MOVE_TABLE = build_move_table()
+
+
 class MoveStrategy:
-    def get_valid_moves(self, piece, board):
+    def get_directions(self, piece):
         raise NotImplementedError
 
-    def explore_direction(self, begin, end, step, color, direction_step, direction_type, board, skipped=[]):
-        found_moves = {}
-        last_moves = []
-        for i_row in range(begin, end, step):
-            if direction_type == Direction.LEFT:
-                if direction_step < 0:
-                    break
-            else:
-                if direction_step >= BoardSettings.COLS:
-                    break
+    def get_valid_moves(self, piece, board):
+        return dict(self.generate_moves(piece, board))
+
+    def generate_moves(self, piece, board):
+        moves = []
+        color = piece.color
+        rays = MOVE_TABLE[piece.row][piece.col]
+        for direction in self.get_directions(piece):
+            neighbour, jump, _ = rays[direction]
+            if neighbour is None:
+                continue
+            field = board[neighbour[0]][neighbour[1]]
+            if field == BoardSettings.EMPTY_FIELD:
+                moves.append((neighbour, []))
+            elif field.color != color and jump and board[jump[0]][jump[1]] == BoardSettings.EMPTY_FIELD:
+                moves.append((jump, [field]))
+                self.explore_chain(jump, Direction.UP if direction in Direction.UP else Direction.DOWN, field, color, board, moves)
+        return moves
+
+    def explore_chain(self, square, directions, captured, color, board, moves):
+        # Depth-first with left before right, so a later chain to the same square wins as it always has
+        stack = [(square, captured, None)]
+        while stack:
+            (row, col), previous, chain_captured = stack.pop()
+            if chain_captured:
+                moves.append(((row, col), chain_captured))
+            rays = MOVE_TABLE[row][col]
+            for direction in reversed(directions):
+                neighbour, _, chain_jump = rays[direction]
+                if chain_jump is None:
+                    continue
+                field = board[neighbour[0]][neighbour[1]]
+                if field != BoardSettings.EMPTY_FIELD and field.color != color and board[chain_jump[0]][chain_jump[1]] == BoardSettings.EMPTY_FIELD:
+                    stack.append((chain_jump, field, [field, previous]))
 
-            field = board[i_row][direction_step]
 
-            if field == BoardSettings.EMPTY_FIELD:
-                if skipped and not last_moves:
-                    break
-                elif skipped:
-                    found_moves[(i_row, direction_step)] = last_moves + skipped
-                else:
-                    found_moves[(i_row, direction_step)] = last_moves
-                if last_moves:
-                    if step == Direction.NEGATIVE_STEP:
-                        row = max(i_row - 3, 0)
-                    else:
-                        row = min(i_row + 3, BoardSettings.ROWS)
-                    found_moves.update(self.explore_direction(i_row + step, row, step, color, direction_step - 1, Direction.LEFT, board, skipped=last_moves))
-                    found_moves.update(self.explore_direction(i_row + step, row, step, color, direction_step + 1, Direction.RIGHT, board, skipped=last_moves))
-                break
-            elif field.color == color:
-                break
-            else:
-                last_moves = [field]
+class NormalMoveStrategy(MoveStrategy):
+    def get_directions(self, piece):
+        return Direction.UP if piece.color == Colors.RED else Direction.DOWN
 
-            if direction_type == Direction.LEFT:
-                direction_step -= 1
-            else:
-                direction_step += 1
+    def __reduce__(self):
+        # Strategies are stateless, so copies and pickles all resolve to the shared instance
+        return 'NORMAL_MOVE_STRATEGY'
 
-        return found_moves
 
+class KingMoveStrategy(MoveStrategy):
+    def get_directions(self, piece):
+        return Direction.ALL
 
-class NormalMoveStrategy(MoveStrategy):
-    def get_valid_moves(self, piece, board):
-        valid_moves = {}
-        if piece.color == Colors.RED:
-            begin = piece.row - 1
-            end = max(piece.row - 3, -1)
-            step = Direction.NEGATIVE_STEP
-        else:
-            begin = piece.row + 1
-            end = min(piece.row + 3, BoardSettings.ROWS)
-            step = Direction.POSITIVE_STEP
+    def __reduce__(self):
+        return 'KING_MOVE_STRATEGY'
 
-        valid_moves.update(self.explore_direction(begin, end, step, piece.color, piece.col - 1, Direction.LEFT, board))
-        valid_moves.update(self.explore_direction(begin, end, step, piece.color, piece.col + 1, Direction.RIGHT, board))
 
-        return valid_moves
+NORMAL_MOVE_STRATEGY = NormalMoveStrategy()
+KING_MOVE_STRATEGY = KingMoveStrategy()
 
 
-class KingMoveStrategy(MoveStrategy):
+class RuleMoveStrategy(MoveStrategy):
+    # Moves under a variant's rules, walking the variant's precomputed rays instead of the classic table
+    def __init__(self, variant, king):
+        self.variant = variant
+        self.king = king
+        self.flying = king and variant.flying_kings
+
+    def get_directions(self, piece):
+        if self.king:
+            return Direction.ALL
+        return Direction.UP if piece.color == Colors.RED else Direction.DOWN
+
+    def get_capture_directions(self, piece):
+        return Direction.ALL if self.king or self.variant.men_capture_backward else self.get_directions(piece)
+
     def get_valid_moves(self, piece, board):
-        valid_moves = {}
-        valid_moves.update(self.explore_direction(piece.row - 1, max(piece.row - 3, -1), Direction.NEGATIVE_STEP, piece.color, piece.col - 1, Direction.LEFT, board))
-        valid_moves.update(self.explore_direction(piece.row - 1, max(piece.row - 3, -1), Direction.NEGATIVE_STEP, piece.color, piece.col + 1, Direction.RIGHT, board))
-        valid_moves.update(self.explore_direction(piece.row + 1, min(piece.row + 3, BoardSettings.ROWS), Direction.POSITIVE_STEP, piece.color, piece.col - 1, Direction.LEFT, board))
-        valid_moves.update(self.explore_direction(piece.row + 1, min(piece.row + 3, BoardSettings.ROWS), Direction.POSITIVE_STEP, piece.color, piece.col + 1, Direction.RIGHT, board))
-        return valid_moves
+        # Two sequences ending on the same square keep the one capturing more
+        moves = {}
+        for destination, captured in self.generate_moves(piece, board):
+            if destination not in moves or len(captured) > len(moves[destination]):
+                moves[destination] = captured
+        return moves
+
+    def generate_moves(self, piece, board):
+        moves = []
+        rays = self.variant.rays[piece.row][piece.col]
+        for direction in self.get_directions(piece):
+            for row, col in rays[direction]:
+                if board[row][col] != BoardSettings.EMPTY_FIELD:
+                    break
+                moves.append(((row, col), []))
+                if not self.flying:
+                    break
+        self.explore_captures(piece, (piece.row, piece.col), [], board, moves)
+        return moves
+
+    def explore_captures(self, piece, square, captured, board, moves):
+        # Captured pieces stay on the board until the move is over, they block and cannot be jumped twice
+        found = False
+        rays = self.variant.rays[square[0]][square[1]]
+        for direction in self.get_capture_directions(piece):
+            ray = rays[direction]
+            index = 0
+            if self.flying:
+                while index < len(ray) and board[ray[index][0]][ray[index][1]] in (BoardSettings.EMPTY_FIELD, piece):
+                    index += 1
+            if index + 1 >= len(ray):
+                continue
+            field = board[ray[index][0]][ray[index][1]]
+            if field == BoardSettings.EMPTY_FIELD or field.color == piece.color or field in captured:
+                continue
+            for landing in ray[index + 1:]:
+                if board[landing[0]][landing[1]] not in (BoardSettings.EMPTY_FIELD, piece):
+                    break
+                found = True
+                self.explore_captures(piece, landing, captured + [field], board, moves)
+                if not self.flying:
+                    break
+        if captured and not found:
+            moves.append((square, captured))
+
+    def __reduce__(self):
+        return get_move_strategy, (self.variant.name, self.king)
+
+
+def get_move_strategy(variant_name, king):
+    variant = VARIANTS[variant_name]
+    return variant.king_strategy if king else variant.man_strategy
+
+
+def build_rays(rows, cols):
+    # rays[row][col][direction] lists the squares from (row, col) to the edge of the board
+    rays = []
+    for row in range(rows):
+        rays.append([])
+        for col in range(cols):
+            square_rays = []
+            for row_step, col_step in Direction.OFFSETS:
+                ray = []
+                next_row, next_col = row + row_step, col + col_step
+                while 0 <= next_row < rows and 0 <= next_col < cols:
+                    ray.append((next_row, next_col))
+                    next_row, next_col = next_row + row_step, next_col + col_step
+                square_rays.append(tuple(ray))
+            rays[row].append(tuple(square_rays))
+    return rays
+
+
+class RuleVariant:
+    # Board size and rules of a variant, with its move tables built once at import
+    def __init__(self, name, size, piece_rows, legacy=False, men_capture_backward=False, flying_kings=False, mandatory_capture=False, max_capture=False):
+        self.name = name
+        self.rows = self.cols = size
+        self.piece_rows = piece_rows
+        self.men_capture_backward = men_capture_backward
+        self.flying_kings = flying_kings
+        self.mandatory_capture = mandatory_capture
+        self.max_capture = max_capture
+        self.squares = size * size // 2
+        self.rays = build_rays(size, size)
+        self.neighbours = [[tuple(ray[0] if ray else None for ray in square_rays) for square_rays in board_row] for board_row in self.rays]
+        self._square_positions = tuple((index // (size // 2), 2 * (index % (size // 2)) + (index // (size // 2) + 1) % 2) for index in range(self.squares))
+        # The classic rules keep the original strategies and their quirks
+        if legacy:
+            self.man_strategy, self.king_strategy = NORMAL_MOVE_STRATEGY, KING_MOVE_STRATEGY
+        else:
+            self.man_strategy, self.king_strategy = RuleMoveStrategy(self, False), RuleMoveStrategy(self, True)
+
+    def get_piece_count(self):
+        return self.piece_rows * self.cols // 2
+
+    def square_index(self, row, col):
+        return row * (self.cols // 2) + col // 2
+
+    def square_position(self, index):
+        return self._square_positions[index]
+
+    def restrict_moves(self, legal_moves):
+        # Where capturing is mandatory only captures stay, with the maximum capture rule only the longest ones
+        if not self.mandatory_capture:
+            return legal_moves
+        longest = max((len(captured) for piece_moves in legal_moves.values() for captured in piece_moves.values()), default=0)
+        if longest == 0:
+            return legal_moves
+        shortest = longest if self.max_capture else 1
+        restricted = {}
+        for origin, piece_moves in legal_moves.items():
+            piece_moves = {destination: captured for destination, captured in piece_moves.items() if len(captured) >= shortest}
+            if piece_moves:
+                restricted[origin] = piece_moves
+        return restricted
+
+    def __reduce__(self):
+        return self.name.upper()
+
+
+CLASSIC = RuleVariant('classic', BoardSettings.ROWS, 3, legacy=True)
+ENGLISH = RuleVariant('english', 8, 3, mandatory_capture=True)
+INTERNATIONAL = RuleVariant('international', 10, 4, men_capture_backward=True, flying_kings=True, mandatory_capture=True, max_capture=True)
+VARIANTS = {variant.name: variant for variant in (CLASSIC, ENGLISH, INTERNATIONAL)}
@@ -0,0 +1,258 @@
+from constants import Colors, PdnSettings
+from model import Caretaker, GameBoard, CLASSIC, ENGLISH, INTERNATIONAL, VARIANTS
+import argparse
+import re
+import time
+
+# Red moves first, so it plays the part of whichever PDN colour moves first in the variant: Black on
+# 8x8 boards, White in international draughts. Square 1 is always on Black's side of the board.
+RED_PLAYS = {CLASSIC.name: 'B', ENGLISH.name: 'B', INTERNATIONAL.name: 'W'}
+GAME_TYPES = {'20': INTERNATIONAL, '21': ENGLISH}
+RESULTS = {'1-0': Colors.RED, '2-0': Colors.RED, '0-1': Colors.WHITE, '0-2': Colors.WHITE, '1/2-1/2': None, '1-1': None, '0-0': None, '*': None}
+TOKEN = re.compile(r'''\s*(?:
+    \[\s*(?P<tag>\w+)\s+"(?P<value>(?:[^"\\]|\\.)*)"\s*\]
+  | (?P<result>1-0|0-1|2-0|0-2|1/2-1/2|1-1|0-0|\*)(?![\d/-])
+  | (?P<move>\d+(?:[-x:]\d+)+)[!?]*
+  | (?P<open>[{(])
+  | (?P<close>[})])
+  | (?P<skip>\d+\.+|\$\d+|;.*|[^\s{}()\[\]]+|\[)
+)''', re.VERBOSE)
+
+
+class PdnError(Exception):
+    pass
+
+
+class PdnGame:
+    def __init__(self, tags, moves, result):
+        self.tags = tags
+        self.moves = moves
+        self.result = result
+
+
+def to_pdn_square(row, col, variant=CLASSIC):
+    index = variant.square_index(row, col)
+    return variant.squares - index if RED_PLAYS[variant.name] == 'B' else index + 1
+
+
+def from_pdn_square(number, variant=CLASSIC):
+    if not 1 <= number <= variant.squares:
+        raise PdnError(f"Square {number} is not on the board")
+    return variant.square_position(variant.squares - number if RED_PLAYS[variant.name] == 'B' else number - 1)
+
+
+def get_color(letter, variant):
+    return Colors.RED if letter.upper() == RED_PLAYS[variant.name] else Colors.WHITE
+
+
+def get_letter(color, variant):
+    red = RED_PLAYS[variant.name]
+    return red if color == Colors.RED else 'W' if red == 'B' else 'B'
+
+
+def get_variant(tags, default=ENGLISH):
+    # Untagged games from other sources are 8x8 checkers; only our own exports name the classic rules
+    if tags.get(PdnSettings.VARIANT_TAG) in VARIANTS:
+        return VARIANTS[tags[PdnSettings.VARIANT_TAG]]
+    game_type = tags.get('GameType', '').split(',')[0].strip()
+    if game_type and game_type not in GAME_TYPES:
+        raise PdnError(f"GameType {game_type} is not supported")
+    return GAME_TYPES.get(game_type, default)
+
+
+def tokenize(lines):
+    # Comments and variations may span lines, so the nesting is carried from one line to the next
+    comment, variation = False, 0
+    for line in lines:
+        position = 0
+        while position < len(line):
+            if comment:
+                end = line.find('}', position)
+                if end < 0:
+                    break
+                comment, position = False, end + 1
+                continue
+            match = TOKEN.match(line, position)
+            if match is None:
+                position += 1
+                continue
+            position = match.end()
+            kind = match.lastgroup
+            if kind == 'value':
+                kind = 'tag'
+            if kind == 'open':
+                if match.group('open') == '{':
+                    comment = True
+                else:
+                    variation += 1
+            elif kind == 'close':
+                variation = max(variation - 1, 0)
+            elif variation == 0 and kind != 'skip':
+                yield kind, match
+
+
+def read_games(lines):
+    tags, moves = {}, []
+    for kind, match in tokenize(lines):
+        if kind == 'tag':
+            if moves:
+                yield PdnGame(tags, moves, None)
+                tags, moves = {}, []
+            tags[match.group('tag')] = match.group('value').replace('\\"', '"')
+        elif kind == 'move':
+            moves.append(tuple(int(number) for number in re.split('[-x:]', match.group('move'))))
+        elif kind == 'result':
+            yield PdnGame(tags, moves, match.group('result'))
+            tags, moves = {}, []
+    if tags or moves:
+        yield PdnGame(tags, moves, None)
+
+
+def parse_fen(fen, variant=CLASSIC):
+    # e.g. 'B:W21,22,K30:B1-3,K9', the leading colour is the side to move
+    fields = fen.strip().rstrip('.').split(':')
+    if not fields or fields[0].upper() not in ('B', 'W'):
+        raise PdnError(f"Malformed FEN '{fen}'")
+    turn = get_color(fields[0], variant)
+    pieces = []
+    for field in fields[1:]:
+        if not field:
+            continue
+        color = get_color(field[0], variant)
+        for entry in filter(None, field[1:].split(',')):
+            king = entry[0].upper() == 'K'
+            first, _, last = entry.lstrip('Kk').partition('-')
+            try:
+                numbers = range(int(first), int(last or first) + 1)
+            except ValueError:
+                raise PdnError(f"Malformed FEN '{fen}'") from None
+            pieces.extend(from_pdn_square(number, variant) + (color, king) for number in numbers)
+    return pieces, turn
+
+
+def format_fen(pieces, turn, variant=CLASSIC):
+    fields = [get_letter(turn, variant)]
+    for letter in ('W', 'B'):
+        color = get_color(letter, variant)
+        squares = sorted((to_pdn_square(row, col, variant), king) for row, col, piece_color, king in pieces if piece_color == color)
+        fields.append(letter + ','.join(('K' if king else '') + str(number) for number, king in squares))
+    return ':'.join(fields)
+
+
+def replay_game(game, game_board_class=GameBoard, default_variant=ENGLISH):
+    variant = get_variant(game.tags, default_variant)
+    if variant is CLASSIC:
+        game_board = game_board_class()
+    elif game_board_class is GameBoard:
+        game_board = GameBoard(variant)
+    else:
+        raise PdnError(f"{game_board_class.__name__} cannot play {variant.name} games")
+    if 'FEN' in game.tags:
+        game_board.set_position(*parse_fen(game.tags['FEN'], variant))
+    caretaker = Caretaker(game_board.get_position(), variant)
+    for move in game.moves:
+        caretaker.add_memento(play_move(game_board, from_pdn_square(move[0], variant), from_pdn_square(move[-1], variant)))
+    return game_board, caretaker
+
+
+def play_move(game_board, origin, destination):
+    game_board.reset_valid_moves()
+    game_board.select(*origin)
+    if not game_board.select(*destination):
+        variant = game_board.get_variant()
+        raise PdnError(f"Move {to_pdn_square(*origin, variant)}-{to_pdn_square(*destination, variant)} is not legal")
+    return game_board.get_last_move()
+
+
+def replay_games(lines, game_board_class=GameBoard, default_variant=ENGLISH):
+    for game in read_games(lines):
+        yield (game,) + replay_game(game, game_board_class, default_variant)
+
+
+def export_game(game_board, caretaker, tags=None):
+    variant = game_board.get_variant()
+    start_pieces, start_turn = caretaker.get_start_position()
+    mementos = caretaker.get_undo_stack()
+    result = {Colors.RED: '1-0', Colors.WHITE: '0-1'}.get(game_board.winner(), '*')
+    if variant is INTERNATIONAL and result != '*':
+        result = result.replace('1', '2')
+
+    header = {'Event': PdnSettings.EVENT, 'Date': time.strftime('%Y.%m.%d'), 'Black': '?', 'White': '?', 'Result': result}
+    for game_type, game_type_variant in GAME_TYPES.items():
+        if game_type_variant is variant:
+            header['GameType'] = game_type
+    if variant is CLASSIC:
+        header[PdnSettings.VARIANT_TAG] = variant.name
+    header.update(tags or {})
+    if (sorted(start_pieces), start_turn) != (sorted(GameBoard(variant).get_position()[0]), Colors.RED):
+        header['FEN'] = format_fen(start_pieces, start_turn, variant)
+    lines = [f'[{name} "{value}"]' for name, value in header.items()]
+    lines.append('')
+
+    words = []
+    # A game starting with white to move opens with '1...'
+    ply = 0 if start_turn == Colors.RED else 1
+    for memento in mementos:
+        separator = 'x' if memento.get_captured() else '-'
+        move = f"{to_pdn_square(*memento.get_origin(), variant)}{separator}{to_pdn_square(*memento.get_destination(), variant)}"
+        if ply % 2 == 0:
+            words.append(f"{ply // 2 + 1}. {move}")
+        elif not words:
+            words.append(f"{ply // 2 + 1}... {move}")
+        else:
+            words.append(move)
+        ply += 1
+    words.append(result)
+
+    line = ''
+    for word in words:
+        if line and len(line) + len(word) + 1 > PdnSettings.LINE_LENGTH:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    return '\n'.join(lines) + '\n'
+
+
+def save_pdn(filename, game_board, caretaker, tags=None):
+    with open(filename, "w") as file:
+        file.write(export_game(game_board, caretaker, tags))
+
+
+def load_pdn(filename, game_board_class=GameBoard, default_variant=ENGLISH):
+    with open(filename) as file:
+        for game in read_games(file):
+            return replay_game(game, game_board_class, default_variant)
+    raise PdnError(f"{filename} holds no games")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay every game of PDN archives through the model')
+    parser.add_argument('files', nargs='+', help='PDN files, read one line at a time')
+    parser.add_argument('--variant', choices=VARIANTS, default=ENGLISH.name, help='rules for games without a GameType tag')
+    args = parser.parse_args()
+
+    games, plies, errors, winners = 0, 0, 0, {}
+    start = time.perf_counter()
+    for filename in args.files:
+        with open(filename, errors='replace') as file:
+            for game in read_games(file):
+                games += 1
+                try:
+                    replay_game(game, default_variant=VARIANTS[args.variant])
+                except PdnError as error:
+                    errors += 1
+                    print(f"{filename} game {games}: {error}")
+                    continue
+                plies += len(game.moves)
+                recorded = RESULTS.get(game.result or game.tags.get('Result', '*'))
+                winners[recorded] = winners.get(recorded, 0) + 1
+    elapsed = time.perf_counter() - start
+    print(f"Replayed {games - errors}/{games} games ({plies} plies) in {elapsed:.1f}s")
+    for color, name in ((Colors.RED, 'black (red) wins'), (Colors.WHITE, 'white wins'), (None, 'draws or unfinished')):
+        print(f"  {name}: {winners.get(color, 0)}")
+
+
+if __name__ == "__main__":
+    main()
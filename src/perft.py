@@ -0,0 +1,137 @@
+from constants import PerftSettings, PdnSettings, VariantSettings
+from bitboard import BitboardGameBoard
+from model import GameBoard, GameBoardMemento, CLASSIC, VARIANTS
+from pdn import load_pdn, parse_fen
+from savefile import load_game, replay_game
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import os
+import time
+
+BOARDS = {'model': GameBoard, 'bitboard': BitboardGameBoard}
+
+
+def perft(game_board, depth):
+    if depth == 0:
+        return 1
+    if isinstance(game_board, BitboardGameBoard):
+        return perft_squares(game_board, depth)
+    if depth == 1:
+        return sum(len(piece_moves) for piece_moves in game_board.all_legal_moves().values())
+    nodes = 0
+    for move in legal_moves(game_board):
+        memento = make_move(game_board, move)
+        nodes += perft(game_board, depth - 1)
+        game_board.revert_move(memento)
+    return nodes
+
+
+def perft_squares(game_board, depth):
+    # Squares and capture masks straight from the bitboard, no positions or pieces are built
+    moves = game_board.legal_square_moves()
+    if depth == 1:
+        return sum(len(piece_moves) for piece_moves in moves.values())
+    nodes = 0
+    for origin, piece_moves in moves.items():
+        for destination, captured in piece_moves.items():
+            memento = game_board.play(origin, destination, captured)
+            nodes += perft_squares(game_board, depth - 1)
+            game_board.revert_move(memento)
+    return nodes
+
+
+def legal_moves(game_board):
+    # Captures are kept as positions, reverting a move restores the captured pieces as new objects
+    moves = []
+    for origin, piece_moves in game_board.all_legal_moves().items():
+        for destination, captured in piece_moves.items():
+            moves.append((origin, destination, tuple((piece.row, piece.col) for piece in captured)))
+    return moves
+
+
+def make_move(game_board, move):
+    origin, destination, captured = move
+    game_board.replay_move(GameBoardMemento(origin, destination, tuple(position + (None, None) for position in captured), False, game_board.get_turn()))
+    return game_board.get_last_move()
+
+
+def root_moves(game_board):
+    return [(origin, destination) for origin, piece_moves in sorted(game_board.all_legal_moves().items()) for destination in sorted(piece_moves)]
+
+
+def create_board(board_name, position, variant=CLASSIC):
+    # The bitboard only knows the classic rules
+    game_board = GameBoard(variant) if board_name == 'model' else BOARDS[board_name]()
+    game_board.set_position(*position)
+    return game_board
+
+
+def perft_root_move(task):
+    board_name, position, variant, move, depth = task
+    game_board = create_board(board_name, position, variant)
+    make_move(game_board, next(legal_move for legal_move in legal_moves(game_board) if legal_move[:2] == move))
+    return move, perft(game_board, depth - 1)
+
+
+def divide(board_name, position, depth, workers=1, variant=CLASSIC):
+    moves = root_moves(create_board(board_name, position, variant))
+    tasks = [(board_name, position, variant, move, depth) for move in moves]
+    if workers > 1 and depth > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return dict(executor.map(perft_root_move, tasks))
+    return dict(map(perft_root_move, tasks))
+
+
+def load_position(args):
+    # A saved game brings its own variant, otherwise --variant applies
+    variant = VARIANTS[args.variant]
+    if args.fen:
+        return parse_fen(args.fen, variant), variant
+    if args.game:
+        if args.game.lower().endswith(PdnSettings.EXTENSION):
+            game_board, _ = load_pdn(args.game)
+        else:
+            game_board, _ = replay_game(load_game(args.game))
+        return game_board.get_position(), game_board.get_variant()
+    return GameBoard(variant).get_position(), variant
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count the leaf nodes of the move tree to verify and time move generation')
+    parser.add_argument('--depth', type=int, default=PerftSettings.DEPTH, help='count leaves this many plies deep')
+    parser.add_argument('--fen', help="start from a PDN FEN such as 'B:W18,K23:B11,14'")
+    parser.add_argument('--game', help='start from the final position of a .dame or .pdn game')
+    parser.add_argument('--board', choices=BOARDS, default='model', help='board implementation driving move generation')
+    parser.add_argument('--variant', choices=VARIANTS, default=VariantSettings.DEFAULT, help='rules to generate moves under')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes the root moves are split across')
+    parser.add_argument('--divide', action='store_true', help='print the node count below every root move')
+    parser.add_argument('--verify', action='store_true', help='check every count against the other board implementation')
+    args = parser.parse_args()
+
+    position, variant = load_position(args)
+    if variant is not CLASSIC and (args.board == 'bitboard' or args.verify):
+        parser.error(f"the bitboard only plays the classic rules, not {variant.name}")
+    other = 'bitboard' if args.board == 'model' else 'model'
+    mismatches = 0
+    for depth in range(1, args.depth + 1):
+        start = time.perf_counter()
+        counts = divide(args.board, position, depth, args.workers, variant)
+        elapsed = time.perf_counter() - start
+        nodes = sum(counts.values())
+        print(f"depth {depth:>2}  {nodes:>14} nodes  {elapsed:>8.3f}s  {nodes / elapsed if elapsed else 0:>12.0f} nodes/s")
+
+        if args.verify:
+            expected = divide(other, position, depth, args.workers)
+            for move in sorted(set(counts) | set(expected)):
+                if counts.get(move) != expected.get(move):
+                    mismatches += 1
+                    print(f"  mismatch after {move[0]} -> {move[1]}: {args.board} {counts.get(move)}, {other} {expected.get(move)}")
+    if args.divide:
+        for (origin, destination), nodes in sorted(counts.items()):
+            print(f"  {origin} -> {destination}: {nodes}")
+    if args.verify:
+        print("Move generation agrees" if not mismatches else f"{mismatches} mismatches")
+
+
+if __name__ == "__main__":
+    main()
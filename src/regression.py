@@ -0,0 +1,133 @@
+from constants import BoardSettings, Colors, RegressionSettings
+from model import GameBoard, Piece, NORMAL_MOVE_STRATEGY, VARIANTS
+from perft import perft
+import argparse
+import random
+import sys
+import time
+
+
+class LegacyMoveStrategy:
+    # The recursive generator the move tables replaced, kept as the reference for the classic rules
+    LEFT = 5
+    RIGHT = 6
+
+    def get_valid_moves(self, piece, board):
+        valid_moves = {}
+        if piece.is_king():
+            valid_moves.update(self.explore_direction(piece.row - 1, max(piece.row - 3, -1), -1, piece.color, piece.col - 1, self.LEFT, board))
+            valid_moves.update(self.explore_direction(piece.row - 1, max(piece.row - 3, -1), -1, piece.color, piece.col + 1, self.RIGHT, board))
+            valid_moves.update(self.explore_direction(piece.row + 1, min(piece.row + 3, BoardSettings.ROWS), 1, piece.color, piece.col - 1, self.LEFT, board))
+            valid_moves.update(self.explore_direction(piece.row + 1, min(piece.row + 3, BoardSettings.ROWS), 1, piece.color, piece.col + 1, self.RIGHT, board))
+            return valid_moves
+        if piece.color == Colors.RED:
+            begin, end, step = piece.row - 1, max(piece.row - 3, -1), -1
+        else:
+            begin, end, step = piece.row + 1, min(piece.row + 3, BoardSettings.ROWS), 1
+        valid_moves.update(self.explore_direction(begin, end, step, piece.color, piece.col - 1, self.LEFT, board))
+        valid_moves.update(self.explore_direction(begin, end, step, piece.color, piece.col + 1, self.RIGHT, board))
+        return valid_moves
+
+    def explore_direction(self, begin, end, step, color, direction_step, direction_type, board, skipped=()):
+        found_moves = {}
+        last_moves = []
+        for i_row in range(begin, end, step):
+            if direction_type == self.LEFT:
+                if direction_step < 0:
+                    break
+            else:
+                if direction_step >= BoardSettings.COLS:
+                    break
+
+            field = board[i_row][direction_step]
+
+            if field == BoardSettings.EMPTY_FIELD:
+                if skipped and not last_moves:
+                    break
+                elif skipped:
+                    found_moves[(i_row, direction_step)] = last_moves + list(skipped)
+                else:
+                    found_moves[(i_row, direction_step)] = last_moves
+                if last_moves:
+                    if step == -1:
+                        row = max(i_row - 3, 0)
+                    else:
+                        row = min(i_row + 3, BoardSettings.ROWS)
+                    found_moves.update(self.explore_direction(i_row + step, row, step, color, direction_step - 1, self.LEFT, board, skipped=last_moves))
+                    found_moves.update(self.explore_direction(i_row + step, row, step, color, direction_step + 1, self.RIGHT, board, skipped=last_moves))
+                break
+            elif field.color == color:
+                break
+            else:
+                last_moves = [field]
+
+            if direction_type == self.LEFT:
+                direction_step -= 1
+            else:
+                direction_step += 1
+
+        return found_moves
+
+
+def random_board(rng):
+    board = [[BoardSettings.EMPTY_FIELD] * BoardSettings.COLS for _ in range(BoardSettings.ROWS)]
+    for row in range(BoardSettings.ROWS):
+        for col in range((row + 1) % 2, BoardSettings.COLS, 2):
+            draw = rng.random()
+            if draw < 0.5:
+                piece = Piece(row, col, Colors.RED if draw < 0.25 else Colors.WHITE, NORMAL_MOVE_STRATEGY)
+                if rng.random() < 0.3:
+                    piece.make_king()
+                board[row][col] = piece
+    return board
+
+
+def describe(moves):
+    # Destinations in generation order, captures as sorted positions
+    return [(destination, sorted((piece.row, piece.col) for piece in captured)) for destination, captured in moves.items()]
+
+
+def check_move_generation(positions, seed):
+    legacy, mismatches = LegacyMoveStrategy(), 0
+    rng = random.Random(seed)
+    for _ in range(positions):
+        board = random_board(rng)
+        for piece in [field for board_row in board for field in board_row if field != BoardSettings.EMPTY_FIELD]:
+            expected, actual = describe(legacy.get_valid_moves(piece, board)), describe(piece.get_valid_moves(board))
+            if actual != expected:
+                mismatches += 1
+                if mismatches <= 10:
+                    print(f"  {'king' if piece.is_king() else 'man'} on {(piece.row, piece.col)}: {actual}, legacy {expected}")
+    return mismatches
+
+
+def check_perft(depth):
+    mismatches = 0
+    for name, counts in RegressionSettings.PUBLISHED_PERFT.items():
+        for ply, expected in enumerate(counts[:depth], 1):
+            nodes = perft(GameBoard(VARIANTS[name]), ply)
+            if nodes != expected:
+                mismatches += 1
+                print(f"  {name} depth {ply}: {nodes} nodes, published {expected}")
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check move generation against the legacy generator and the published perft counts')
+    parser.add_argument('--positions', type=int, default=RegressionSettings.POSITIONS, help='random classic positions compared with the legacy generator')
+    parser.add_argument('--seed', type=int, default=RegressionSettings.SEED, help='seed for the random positions')
+    parser.add_argument('--depth', type=int, default=RegressionSettings.PERFT_DEPTH, help='deepest published perft count checked, at most 7')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generation = check_move_generation(args.positions, args.seed)
+    print(f"Move generation: {generation} mismatches in {args.positions} positions ({time.perf_counter() - start:.1f}s)")
+    start = time.perf_counter()
+    counts = check_perft(args.depth)
+    print(f"Perft: {counts} mismatches up to depth {args.depth} ({time.perf_counter() - start:.1f}s)")
+    if generation or counts:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from constants import Colors, SaveSettings
+from model import Caretaker, GameBoard, CLASSIC, ENGLISH, INTERNATIONAL
+import mmap
+import os
+import struct
+
+HEADER = struct.Struct('<4sBBH')
+# Version 1 only held classic games in 32-bit masks, version 2 records the variant and has room for 50 squares
+LEGACY_POSITION = struct.Struct('<IIIB')
+POSITION = struct.Struct('<QQQB')
+COUNTS = struct.Struct('<II')
+MOVE = struct.Struct('<BB')
+VARIANTS = (CLASSIC, ENGLISH, INTERNATIONAL)
+
+
+class SaveFormatError(Exception):
+    pass
+
+
+class GameRecord:
+    def __init__(self, start_position, history, future, variant=CLASSIC):
+        self.start_position = start_position
+        self.history = history
+        self.future = future
+        self.variant = variant
+
+
+def encode_game(game_board, caretaker):
+    undo_stack, redo_stack = caretaker.get_undo_stack(), caretaker.get_redo_stack()
+    variant = game_board.get_variant()
+
+    start_pieces, start_turn = caretaker.get_start_position()
+    red = white = kings = 0
+    for row, col, color, king in start_pieces:
+        bit = 1 << variant.square_index(row, col)
+        if color == Colors.RED:
+            red |= bit
+        else:
+            white |= bit
+        if king:
+            kings |= bit
+
+    # The redo stack is popped from the end, so the next move to redo is stored first
+    moves = list(undo_stack) + list(reversed(redo_stack))
+    parts = [
+        HEADER.pack(SaveSettings.MAGIC, SaveSettings.VERSION, VARIANTS.index(variant), 0),
+        POSITION.pack(red, white, kings, 0 if start_turn == Colors.RED else 1),
+        COUNTS.pack(len(undo_stack), len(redo_stack))
+    ]
+    parts.extend(MOVE.pack(variant.square_index(*memento.get_origin()), variant.square_index(*memento.get_destination())) for memento in moves)
+    return b''.join(parts)
+
+
+def decode_game(buffer):
+    if len(buffer) < HEADER.size + LEGACY_POSITION.size + COUNTS.size:
+        raise SaveFormatError("File is too short to be a saved game")
+    magic, version, variant_code, _ = HEADER.unpack_from(buffer, 0)
+    if magic != SaveSettings.MAGIC:
+        raise SaveFormatError("Not a saved game")
+    if version > SaveSettings.VERSION:
+        raise SaveFormatError(f"Unsupported save format version {version}")
+    position = POSITION
+    if version < 2:
+        position, variant_code = LEGACY_POSITION, 0
+    if variant_code >= len(VARIANTS):
+        raise SaveFormatError(f"Unknown rule variant {variant_code}")
+    variant = VARIANTS[variant_code]
+
+    offset = HEADER.size
+    if len(buffer) < offset + position.size + COUNTS.size:
+        raise SaveFormatError("File is too short to be a saved game")
+    red, white, kings, turn = position.unpack_from(buffer, offset)
+    offset += position.size
+    history_length, future_length = COUNTS.unpack_from(buffer, offset)
+    offset += COUNTS.size
+    if len(buffer) < offset + (history_length + future_length) * MOVE.size:
+        raise SaveFormatError("Saved game is truncated")
+
+    try:
+        moves = [variant.square_position(origin) + variant.square_position(destination) for origin, destination in MOVE.iter_unpack(buffer[offset:offset + (history_length + future_length) * MOVE.size])]
+        pieces = [variant.square_position(square) + (Colors.RED if red >> square & 1 else Colors.WHITE, bool(kings >> square & 1)) for square in range(variant.squares) if (red | white) >> square & 1]
+    except IndexError:
+        raise SaveFormatError("Saved game has squares off the board") from None
+    start_position = (pieces, Colors.RED if turn == 0 else Colors.WHITE)
+    return GameRecord(start_position, moves[:history_length], moves[history_length:], variant)
+
+
+def replay_game(record):
+    game_board = GameBoard(record.variant)
+    game_board.set_position(*record.start_position)
+
+    caretaker = Caretaker(game_board.get_position(), record.variant)
+    for move in record.history:
+        caretaker.add_memento(play_move(game_board, move))
+
+    future = [play_move(game_board, move) for move in record.future]
+    for memento in reversed(future):
+        game_board.revert_move(memento)
+    caretaker.set_redo_stack(list(reversed(future)))
+    return game_board, caretaker
+
+
+def play_move(game_board, move):
+    origin_row, origin_col, destination_row, destination_col = move
+    game_board.select(origin_row, origin_col)
+    if not game_board.select(destination_row, destination_col):
+        raise SaveFormatError(f"Saved move {(origin_row, origin_col)} -> {(destination_row, destination_col)} is not legal")
+    return game_board.get_last_move()
+
+
+def save_game(filename, game_board, caretaker):
+    with open(filename, "wb") as file:
+        file.write(encode_game(game_board, caretaker))
+
+
+def load_game(filename, mapped=False):
+    with open(filename, "rb") as file:
+        if not mapped or os.fstat(file.fileno()).st_size == 0:
+            return decode_game(file.read())
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            return decode_game(buffer)
@@ -0,0 +1,215 @@
+from constants import Colors, NetworkSettings
+from bitboard import BitBoard, BitboardGameBoard, Squares, iterate_squares, square_position, SQUARE_BITS
+from model import GameModel
+import argparse
+import asyncio
+import json
+
+COLOR_NAMES = {Colors.RED: 'red', Colors.WHITE: 'white'}
+SQUARE_CODES = {'r': (Colors.RED, False), 'R': (Colors.RED, True), 'w': (Colors.WHITE, False), 'W': (Colors.WHITE, True)}
+
+
+class MoveError(Exception):
+    pass
+
+
+def encode_square(bit_board, square):
+    bit = SQUARE_BITS[square]
+    code = 'r' if bit_board.red & bit else 'w' if bit_board.white & bit else '.'
+    return code.upper() if bit_board.kings & bit else code
+
+
+def encode_board(bit_board):
+    return ''.join(encode_square(bit_board, square) for square in range(Squares.COUNT))
+
+
+def decode_board(board, turn):
+    bit_board = BitBoard(0, 0, 0, Colors.RED if turn == 'red' else Colors.WHITE)
+    for square, code in enumerate(board):
+        if code in SQUARE_CODES:
+            apply_square(bit_board, square, code)
+    return bit_board
+
+
+def apply_square(bit_board, square, code):
+    bit = SQUARE_BITS[square]
+    bit_board.red &= ~bit
+    bit_board.white &= ~bit
+    bit_board.kings &= ~bit
+    if code in SQUARE_CODES:
+        color, king = SQUARE_CODES[code]
+        if color == Colors.RED:
+            bit_board.red |= bit
+        else:
+            bit_board.white |= bit
+        if king:
+            bit_board.kings |= bit
+
+
+def board_diff(previous, current):
+    changed = (previous.red ^ current.red) | (previous.white ^ current.white) | (previous.kings ^ current.kings)
+    return [[*square_position(square), encode_square(current, square)] for square in iterate_squares(changed)]
+
+
+def encode_message(message):
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+
+class GameSession:
+    __slots__ = ('game_id', 'game_model', 'seats', 'spectators')
+
+    def __init__(self, game_id):
+        self.game_id = game_id
+        self.game_model = GameModel(BitboardGameBoard)
+        self.seats = {}
+        self.spectators = []
+
+    def join(self, writer):
+        for color in (Colors.RED, Colors.WHITE):
+            if color not in self.seats:
+                self.seats[color] = writer
+                return color
+        self.spectators.append(writer)
+        return None
+
+    def leave(self, writer):
+        for color, seated in list(self.seats.items()):
+            if seated is writer:
+                del self.seats[color]
+        if writer in self.spectators:
+            self.spectators.remove(writer)
+
+    def is_empty(self):
+        return not self.seats and not self.spectators
+
+    def is_ready(self):
+        return len(self.seats) == 2
+
+    def get_winner(self):
+        return self.game_model.game_board.winner()
+
+    def state_message(self, message_type):
+        bit_board = self.game_model.game_board.get_bit_board()
+        return {
+            'type': message_type,
+            'game': self.game_id,
+            'board': encode_board(bit_board),
+            'turn': COLOR_NAMES[bit_board.turn],
+            'ready': self.is_ready(),
+            'winner': COLOR_NAMES.get(self.get_winner())
+        }
+
+    def play(self, color, origin, destination):
+        game_board = self.game_model.game_board
+        if not self.is_ready():
+            raise MoveError("Waiting for an opponent")
+        if self.get_winner() is not None:
+            raise MoveError("The game is over")
+        if color != game_board.get_turn():
+            raise MoveError("It is not your turn")
+
+        previous = game_board.get_bit_board().copy()
+        game_board.reset_valid_moves()
+        game_board.select(*origin)
+        if not game_board.select(*destination):
+            raise MoveError(f"Illegal move {origin} -> {destination}")
+
+        current = game_board.get_bit_board()
+        return {
+            'type': 'update',
+            'game': self.game_id,
+            'move': [list(origin), list(destination)],
+            'changes': board_diff(previous, current),
+            'turn': COLOR_NAMES[current.turn],
+            'winner': COLOR_NAMES.get(self.get_winner())
+        }
+
+    def broadcast(self, message):
+        data = encode_message(message)
+        for writer in list(self.seats.values()) + self.spectators:
+            if not writer.is_closing():
+                writer.write(data)
+
+
+class GameServer:
+    def __init__(self):
+        self.sessions = {}
+
+    async def start(self, host=NetworkSettings.HOST, port=NetworkSettings.PORT):
+        return await asyncio.start_server(self.handle_client, host, port, limit=NetworkSettings.LINE_LIMIT)
+
+    async def handle_client(self, reader, writer):
+        session, color = None, None
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    writer.write(encode_message({'type': 'error', 'message': "Line too long"}))
+                    break
+                if not line:
+                    break
+
+                try:
+                    message = json.loads(line)
+                    message_type = message['type']
+                except (ValueError, KeyError, TypeError):
+                    writer.write(encode_message({'type': 'error', 'message': "Malformed message"}))
+                    continue
+
+                if message_type == 'join' and session is None:
+                    session = self.get_session(str(message.get('game', 'default')))
+                    color = session.join(writer)
+                    joined = session.state_message('joined')
+                    joined['color'] = COLOR_NAMES.get(color, 'spectator')
+                    writer.write(encode_message(joined))
+                    if color is not None and session.is_ready():
+                        session.broadcast(session.state_message('ready'))
+                elif message_type == 'move' and session is not None:
+                    try:
+                        origin, destination = tuple(message['from']), tuple(message['to'])
+                        session.broadcast(session.play(color, origin, destination))
+                    except (MoveError, KeyError, TypeError, ValueError) as error:
+                        writer.write(encode_message({'type': 'error', 'message': str(error)}))
+                elif message_type == 'state' and session is not None:
+                    writer.write(encode_message(session.state_message('state')))
+                else:
+                    writer.write(encode_message({'type': 'error', 'message': f"Unexpected '{message_type}' message"}))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            if session is not None:
+                session.leave(writer)
+                if session.is_empty():
+                    self.sessions.pop(session.game_id, None)
+                else:
+                    session.broadcast({'type': 'left', 'game': session.game_id, 'color': COLOR_NAMES.get(color, 'spectator')})
+            writer.close()
+
+    def get_session(self, game_id):
+        if game_id not in self.sessions:
+            self.sessions[game_id] = GameSession(game_id)
+        return self.sessions[game_id]
+
+
+async def serve(host, port):
+    server = await GameServer().start(host, port)
+    print("Serving games on", ', '.join(str(sock.getsockname()) for sock in server.sockets))
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Host Dame games over a JSON line protocol')
+    parser.add_argument('--host', default=NetworkSettings.HOST)
+    parser.add_argument('--port', type=int, default=NetworkSettings.PORT)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from constants import Colors, EndgameSettings
+from bitboard import BitBoard, Squares, PROMOTION_MASK, SQUARE_BITS, square_position
+from collections import deque
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import time
+
+HEADER = struct.Struct('<4sBBI')
+KEY = struct.Struct('>BIII')
+RECORD_SIZE = KEY.size + 2
+RED_MAN_ROW_MASK = sum(SQUARE_BITS[square] for square in range(Squares.COUNT) if square_position(square)[0] == 0)
+WHITE_MAN_ROW_MASK = PROMOTION_MASK & ~RED_MAN_ROW_MASK
+
+
+class Result:
+    DRAW = 0
+    WIN = 1
+    LOSS = 2
+
+
+def position_key(bit_board):
+    return KEY.pack(0 if bit_board.turn == Colors.RED else 1, bit_board.red, bit_board.white, bit_board.kings)
+
+
+def enumerate_positions(max_pieces):
+    # Piece kinds: red man, red king, white man, white king
+    for count in range(2, max_pieces + 1):
+        for squares in itertools.combinations(range(Squares.COUNT), count):
+            for kinds in itertools.product(range(4), repeat=count):
+                red = white = kings = 0
+                for square, kind in zip(squares, kinds):
+                    if kind < 2:
+                        red |= SQUARE_BITS[square]
+                    else:
+                        white |= SQUARE_BITS[square]
+                    if kind % 2:
+                        kings |= SQUARE_BITS[square]
+                # Both sides need a piece, and men never stand on the row that would have crowned them
+                if not red or not white or red & ~kings & RED_MAN_ROW_MASK or white & ~kings & WHITE_MAN_ROW_MASK:
+                    continue
+                yield BitBoard(red, white, kings, Colors.RED)
+                yield BitBoard(red, white, kings, Colors.WHITE)
+
+
+def solve(max_pieces, progress=None):
+    positions = sorted(position_key(bit_board) for bit_board in enumerate_positions(max_pieces))
+    index = {key: position for position, key in enumerate(positions)}
+    results = bytearray(len(positions))
+    distances = bytearray(len(positions))
+    remaining = [0] * len(positions)
+    predecessors = [[] for _ in positions]
+    queue = deque()
+
+    for position, key in enumerate(positions):
+        turn, red, white, kings = KEY.unpack(key)
+        bit_board = BitBoard(red, white, kings, Colors.RED if turn == 0 else Colors.WHITE)
+        moves = bit_board.legal_moves()
+        if not moves:
+            results[position] = Result.LOSS
+        for origin, destination, captured in moves:
+            child = bit_board.copy()
+            child.make_move(origin, destination, captured)
+            if child.winner() is not None:
+                results[position] = Result.WIN
+                distances[position] = 1
+            else:
+                predecessors[index[position_key(child)]].append(position)
+                remaining[position] += 1
+        if progress and position % 100000 == 0:
+            progress(f"Generated moves for {position}/{len(positions)} positions")
+
+    # Retrograde pass: resolve positions in order of increasing distance to the end of the game
+    for position in sorted((position for position in range(len(positions)) if results[position]), key=lambda position: distances[position]):
+        queue.append(position)
+    while queue:
+        position = queue.popleft()
+        distance = min(distances[position] + 1, 255)
+        for predecessor in predecessors[position]:
+            if results[predecessor] != Result.DRAW:
+                continue
+            if results[position] == Result.LOSS:
+                results[predecessor], distances[predecessor] = Result.WIN, distance
+                queue.append(predecessor)
+            else:
+                remaining[predecessor] -= 1
+                if remaining[predecessor] == 0:
+                    results[predecessor], distances[predecessor] = Result.LOSS, distance
+                    queue.append(predecessor)
+
+    return positions, results, distances
+
+
+def build_tablebase(filename, max_pieces, progress=None):
+    positions, results, distances = solve(max_pieces, progress)
+    with open(filename, "wb") as file:
+        file.write(HEADER.pack(EndgameSettings.TABLEBASE_MAGIC, EndgameSettings.VERSION, max_pieces, len(positions)))
+        for position, key in enumerate(positions):
+            file.write(key + bytes((results[position], distances[position])))
+    return len(positions)
+
+
+class EndgameTablebase:
+    def __init__(self, filename):
+        with open(filename, "rb") as file:
+            self._buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_pieces, self._count = HEADER.unpack_from(self._buffer, 0)
+        if magic != EndgameSettings.TABLEBASE_MAGIC or version > EndgameSettings.VERSION:
+            raise ValueError(f"{filename} is not a supported endgame tablebase")
+
+    def close(self):
+        self._buffer.close()
+
+    def covers(self, bit_board):
+        return (bit_board.red | bit_board.white).bit_count() <= self.max_pieces
+
+    def probe(self, bit_board):
+        if not bit_board.red or not bit_board.white or not self.covers(bit_board):
+            return None
+        key = position_key(bit_board)
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = HEADER.size + middle * RECORD_SIZE
+            record_key = self._buffer[offset:offset + KEY.size]
+            if record_key < key:
+                low = middle + 1
+            elif record_key > key:
+                high = middle
+            else:
+                return self._buffer[offset + KEY.size], self._buffer[offset + KEY.size + 1]
+        return None
+
+    def best_move(self, bit_board):
+        best, best_rank = None, None
+        for origin, destination, captured in bit_board.legal_moves():
+            child = bit_board.copy()
+            child.make_move(origin, destination, captured)
+            if child.winner() is not None:
+                return origin, destination
+            entry = self.probe(child)
+            if entry is None:
+                return None
+            result, distance = entry
+            # The child is scored for the opponent: prefer their fastest loss, then a draw, then their slowest win
+            rank = (2, -distance) if result == Result.LOSS else (1, 0) if result == Result.DRAW else (0, distance)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = (origin, destination), rank
+        return best
+
+
+def load_tablebase(filename=EndgameSettings.TABLEBASE_FILE):
+    return EndgameTablebase(filename) if os.path.exists(filename) else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the endgame tablebase by retrograde analysis')
+    parser.add_argument('--pieces', type=int, default=EndgameSettings.TABLEBASE_PIECES, help='largest number of pieces on the board')
+    parser.add_argument('--output', default=EndgameSettings.TABLEBASE_FILE)
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    start = time.perf_counter()
+    count = build_tablebase(args.output, args.pieces, print)
+    print(f"Solved {count} positions with up to {args.pieces} pieces in {time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
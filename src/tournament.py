@@ -0,0 +1,133 @@
+from constants import Colors, TournamentSettings, VariantSettings
+from ai import AlphaBetaSearch
+from book import load_book
+from tablebase import load_tablebase
+from bitboard import BitboardGameBoard
+from model import GameBoard, CLASSIC, VARIANTS
+from concurrent.futures import ProcessPoolExecutor
+import argparse
+import json
+import os
+import random
+import time
+
+COLOR_NAMES = {Colors.RED: 'red', Colors.WHITE: 'white'}
+BOARDS = {'model': GameBoard, 'bitboard': BitboardGameBoard}
+
+
+class RandomPlayer:
+    def __init__(self, seed):
+        self._random = random.Random(seed)
+
+    def choose_move(self, game_board):
+        moves = [(origin, destination) for origin, piece_moves in game_board.all_legal_moves().items() for destination in piece_moves]
+        return self._random.choice(moves) if moves else None
+
+
+class SearchPlayer:
+    def __init__(self, time_budget, max_depth):
+        self._search = AlphaBetaSearch(time_budget, max_depth, opening_book=load_book(), tablebase=load_tablebase())
+
+    def choose_move(self, game_board):
+        return self._search.search(game_board).move
+
+
+def create_player(spec, seed):
+    # 'random', 'ai:<seconds per move>' or 'depth:<plies>'
+    name, _, argument = spec.partition(':')
+    if name == 'random':
+        return RandomPlayer(seed)
+    if name == 'ai':
+        return SearchPlayer(float(argument) if argument else TournamentSettings.TIME_BUDGET, TournamentSettings.MAX_DEPTH)
+    if name == 'depth':
+        return SearchPlayer(float('inf'), int(argument))
+    raise ValueError(f"Unknown player '{spec}'")
+
+
+def play_game(task):
+    index, seed, red_spec, white_spec, max_plies, variant_name, board_name = task
+    variant = VARIANTS[variant_name]
+    # The bitboard only knows the classic rules
+    game_board = GameBoard(variant) if board_name == 'model' else BOARDS[board_name]()
+    players = {Colors.RED: create_player(red_spec, seed), Colors.WHITE: create_player(white_spec, seed + 1)}
+    move_times = {Colors.RED: [], Colors.WHITE: []}
+    winner, reason, plies = None, 'max plies', 0
+
+    while plies < max_plies:
+        if game_board.winner():
+            winner, reason = game_board.winner(), 'no pieces' if 0 in game_board.get_pieces_left() else 'no moves'
+            break
+        turn = game_board.get_turn()
+        start = time.perf_counter()
+        move = players[turn].choose_move(game_board)
+        move_times[turn].append(time.perf_counter() - start)
+        if move is None:
+            winner, reason = Colors.WHITE if turn == Colors.RED else Colors.RED, 'no moves'
+            break
+        origin, destination = move
+        game_board.select(*origin)
+        if not game_board.select(*destination):
+            raise RuntimeError(f"Game {index}: illegal move {origin} -> {destination}")
+        plies += 1
+
+    return {
+        'game': index,
+        'variant': variant_name,
+        'seed': seed,
+        'red': red_spec,
+        'white': white_spec,
+        'winner': COLOR_NAMES.get(winner, 'draw'),
+        'reason': reason,
+        'plies': plies,
+        'red_move_times': [round(seconds, 6) for seconds in move_times[Colors.RED]],
+        'white_move_times': [round(seconds, 6) for seconds in move_times[Colors.WHITE]]
+    }
+
+
+def create_tasks(args):
+    tasks = []
+    for index in range(args.games):
+        red_spec, white_spec = args.red, args.white
+        if args.alternate and index % 2:
+            red_spec, white_spec = white_spec, red_spec
+        tasks.append((index, args.seed + 2 * index, red_spec, white_spec, args.max_plies, args.variant, args.board))
+    return tasks
+
+
+def run_tournament(args):
+    tally = {}
+    with ProcessPoolExecutor(max_workers=args.workers) as executor, open(args.output, 'w') as output:
+        chunksize = max(1, args.games // (args.workers * TournamentSettings.CHUNKS_PER_WORKER))
+        for result in executor.map(play_game, create_tasks(args), chunksize=chunksize):
+            output.write(json.dumps(result) + '\n')
+            output.flush()
+            winner_spec = result[result['winner']] if result['winner'] != 'draw' else 'draw'
+            tally[winner_spec] = tally.get(winner_spec, 0) + 1
+    return tally
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Play headless Dame games between two players in parallel')
+    parser.add_argument('--games', type=int, default=100, help='number of games to play')
+    parser.add_argument('--red', default='random', help="red player: 'random', 'ai:<seconds>' or 'depth:<plies>'")
+    parser.add_argument('--white', default='random', help="white player: 'random', 'ai:<seconds>' or 'depth:<plies>'")
+    parser.add_argument('--variant', choices=VARIANTS, default=VariantSettings.DEFAULT, help='rules the games are played under')
+    parser.add_argument('--board', choices=BOARDS, default='model', help='board implementation the games are played on')
+    parser.add_argument('--alternate', action='store_true', help='swap colours every other game')
+    parser.add_argument('--seed', type=int, default=0, help='base seed, game i uses seed + 2i')
+    parser.add_argument('--max-plies', type=int, default=TournamentSettings.MAX_PLIES, help='plies before a game is scored as a draw')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (defaults to all cores)')
+    parser.add_argument('--output', default='tournament.jsonl', help='file receiving one JSON result per game')
+    args = parser.parse_args()
+    if args.board == 'bitboard' and VARIANTS[args.variant] is not CLASSIC:
+        parser.error(f"the bitboard only plays the classic rules, not {args.variant}")
+
+    start = time.perf_counter()
+    tally = run_tournament(args)
+    print(f"Played {args.games} {args.variant} games in {time.perf_counter() - start:.1f}s with {args.workers} workers")
+    for name, count in sorted(tally.items()):
+        print(f"  {name}: {count}")
+
+
+if __name__ == "__main__":
+    main()
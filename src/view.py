@@ -1,5 +1,5 @@
 import pygame
-from constants import BoardSettings, Colors, Assets, PieceSettings, Settings
+from constants import BoardSettings, Colors, Assets, FontSettings, PieceSettings, Settings, TimelineSettings
 
 
 class GameView:
@@ -10,31 +10,66 @@ class GameView:
 
     def initialize(self):
         pygame.init()
-        self.window = pygame.display.set_mode((BoardSettings.WIDTH - 3, BoardSettings.HEIGHT + 75))
+        Assets.load()
+        self.window = pygame.display.set_mode((BoardSettings.WIDTH - 3, TimelineSettings.TOP + TimelineSettings.HEIGHT + 10))
         self.clock = pygame.time.Clock()
         self.name = pygame.display.set_caption('Dame')
         pygame.display.set_icon(Assets.LOGO)
         self.window.fill(Colors.GREY)
+        self.set_variant(self.game_controller.game_model.game_board.get_variant())
+        self._drawn_cells = {}
+        self._drawn_buttons = {}
+        self._drawn_timeline = None
+        self._full_redraw = True
+
+    def set_variant(self, variant):
+        # The board always fills the same area, so larger variants get smaller cells
+        self.variant = variant
+        self.cell_size = BoardSettings.WIDTH // variant.cols
+        crown_size = Assets.CROWN.get_width() * self.cell_size // BoardSettings.CELL_SIZE
+        self.crown = pygame.transform.smoothscale(Assets.CROWN, (crown_size, crown_size)) if self.cell_size != BoardSettings.CELL_SIZE else Assets.CROWN
+        self.background = self.create_background()
+        self._drawn_cells = {}
+        self.invalidate()
+
+    def get_cell_size(self):
+        return self.cell_size
+
+    def create_background(self):
+        background = pygame.Surface((self.variant.cols * self.cell_size, self.variant.rows * self.cell_size))
+        self.draw_fields(background)
+        return background
+
+    def invalidate(self):
+        self._full_redraw = True
 
     def tick(self):
         self.clock.tick(Settings.FPS)
 
     def update(self):
-        # Update the board
-        self.draw_board(self.window, self.game_controller.game_model.game_board)
+        # A loaded game may be played under other rules
+        game_board = self.game_controller.game_model.game_board
+        if game_board.get_variant() is not self.variant:
+            self.set_variant(game_board.get_variant())
 
-        # Update valid moves
-        self.draw_valid_moves(self.game_controller.game_model.game_board.get_valid_moves())
+        # Update current player
+        self.draw_player_turn()
+
+        # Update the board and valid moves
+        dirty_rects = self.draw_board(self.window, self.game_controller.game_model.game_board)
 
         # Update buttons
-        for button in self.buttons.values():
-            button.draw(self.window)
+        dirty_rects += self.draw_buttons(self.window)
 
-        # Update current player
-        self.draw_player_turn()
+        # Update the position in the game history
+        dirty_rects += self.draw_timeline(self.window, self.game_controller.caretaker)
 
-        # Update the display
-        pygame.display.update()
+        # Update only the changed parts of the display
+        if self._full_redraw:
+            pygame.display.update()
+            self._full_redraw = False
+        elif dirty_rects:
+            pygame.display.update(dirty_rects)
 
     def create_buttons(self):
         self.buttons = {
@@ -45,34 +80,85 @@ class GameView:
             'player': Button(Colors.RED, 480 + 10, BoardSettings.HEIGHT + 20, 145, 40, 'Player')
         }
 
+    def get_cell_center(self, row, col):
+        return self.cell_size * col + self.cell_size // 2, self.cell_size * row + self.cell_size // 2
+
     def draw_piece(self, window, piece):
         if piece is None:
             return
-        radius = BoardSettings.CELL_SIZE // 2 - PieceSettings.PADDING
-        pygame.draw.circle(window, Colors.GREY, (piece.x, piece.y), radius + PieceSettings.OUTLINE)
-        pygame.draw.circle(window, piece.color, (piece.x, piece.y), radius)
+        x, y = self.get_cell_center(piece.row, piece.col)
+        radius = self.cell_size // 2 - PieceSettings.PADDING * self.cell_size // BoardSettings.CELL_SIZE
+        pygame.draw.circle(window, Colors.GREY, (x, y), radius + PieceSettings.OUTLINE)
+        pygame.draw.circle(window, piece.color, (x, y), radius)
         if piece.is_king():
-            window.blit(Assets.CROWN, (piece.x - Assets.CROWN.get_width() // 2, piece.y - Assets.CROWN.get_height() // 2))
+            window.blit(self.crown, (x - self.crown.get_width() // 2, y - self.crown.get_height() // 2))
 
     def draw_board(self, window, game_board):
-        self.draw_fields(window)
-        for row in range(BoardSettings.ROWS):
-            for col in range(BoardSettings.COLS):
+        dirty_rects = []
+        valid_moves = game_board.get_valid_moves()
+        for row in range(self.variant.rows):
+            for col in range(self.variant.cols):
                 piece = game_board.get_field(row, col)
-                if piece != 0:
+                state = (None if piece == BoardSettings.EMPTY_FIELD else (piece.color, piece.is_king()), (row, col) in valid_moves)
+                if not self._full_redraw and self._drawn_cells.get((row, col)) == state:
+                    continue
+                self._drawn_cells[(row, col)] = state
+                cell = pygame.Rect(col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size)
+                window.blit(self.background, cell.topleft, cell)
+                if piece != BoardSettings.EMPTY_FIELD:
                     self.draw_piece(window, piece)
+                if state[1]:
+                    self.draw_valid_move(row, col)
+                dirty_rects.append(cell)
+        return dirty_rects
 
     def draw_fields(self, window):
-        for row in range(BoardSettings.ROWS):
-            for col in range(BoardSettings.COLS):
+        for row in range(self.variant.rows):
+            for col in range(self.variant.cols):
                 color = Colors.BROWN if (row + col) % 2 == 0 else Colors.BLACK
-                pygame.draw.rect(window, color, (col * BoardSettings.CELL_SIZE, row * BoardSettings.CELL_SIZE, BoardSettings.CELL_SIZE, BoardSettings.CELL_SIZE))
-
-    def draw_valid_moves(self, moves):
-        for move in moves:
-            row, col = move
-            pygame.draw.circle(self.window, Colors.GREEN,
-                               (col * BoardSettings.CELL_SIZE + BoardSettings.CELL_SIZE // 2, row * BoardSettings.CELL_SIZE + BoardSettings.CELL_SIZE // 2), 20, 4)
+                pygame.draw.rect(window, color, (col * self.cell_size, row * self.cell_size, self.cell_size, self.cell_size))
+
+    def draw_valid_move(self, row, col):
+        pygame.draw.circle(self.window, Colors.GREEN, self.get_cell_center(row, col), 20 * self.cell_size // BoardSettings.CELL_SIZE, 4)
+
+    def draw_buttons(self, window):
+        dirty_rects = []
+        for name, button in self.buttons.items():
+            state = (button.color, button.text)
+            if not self._full_redraw and self._drawn_buttons.get(name) == state:
+                continue
+            self._drawn_buttons[name] = state
+            button.draw(window)
+            dirty_rects.append(button.get_rect())
+        return dirty_rects
+
+    def get_timeline_rect(self):
+        return pygame.Rect(TimelineSettings.MARGIN, TimelineSettings.TOP, BoardSettings.WIDTH - 3 - 2 * TimelineSettings.MARGIN, TimelineSettings.HEIGHT)
+
+    def get_timeline_ply(self, x, plies):
+        rect = self.get_timeline_rect()
+        return round(max(0, min(x - rect.x, rect.width)) * plies / rect.width)
+
+    def get_timeline_x(self, ply, plies):
+        rect = self.get_timeline_rect()
+        return rect.x + (rect.width * ply // plies if plies else 0)
+
+    def draw_timeline(self, window, caretaker):
+        plies, cursor = len(caretaker), caretaker.get_cursor()
+        state = (plies, cursor, tuple(caretaker.get_branches()))
+        if not self._full_redraw and self._drawn_timeline == state:
+            return []
+        self._drawn_timeline = state
+        rect = self.get_timeline_rect()
+        pygame.draw.rect(window, Colors.GREY, rect.inflate(4, 4))
+        pygame.draw.rect(window, Colors.BLACK, rect.inflate(4, 4), 1)
+        pygame.draw.rect(window, Colors.WHITE, (rect.x, rect.y, self.get_timeline_x(cursor, plies) - rect.x, rect.height))
+        for ply in state[2]:
+            pygame.draw.rect(window, Colors.BLUE, (self.get_timeline_x(ply, plies), rect.y, TimelineSettings.MARKER_WIDTH, rect.height))
+        return [rect.inflate(4, 4)]
+
+    def set_status(self, text):
+        self.buttons['player'].text = text if text else 'Player'
 
     def draw_player_turn(self):
         self.buttons['player'].color = self.game_controller.game_model.game_board.get_turn()
@@ -80,24 +166,69 @@ class GameView:
     def display_winner(self):
         winner = self.game_controller.game_model.game_board.winner()
         winner = 'RED' if winner == Colors.RED else 'WHITE'
-        font = pygame.font.SysFont('comicsans', 60)
         message = f"{winner} WINS!" if winner else "Draw!"
-        text = font.render(message, True, Colors.GOLD)
+        text = FontCache.render(message, FontSettings.WINNER_SIZE, Colors.GOLD)
         self.window.blit(text, (
             BoardSettings.WIDTH // 2 - text.get_width() // 2,
             BoardSettings.HEIGHT // 2 - text.get_height() // 2))
         pygame.display.update()
+        self.invalidate()
         pygame.time.delay(3000)
 
 
+class FontCache:
+    _fonts = {}
+    _surfaces = {}
+
+    @classmethod
+    def get_font(cls, size):
+        if size not in cls._fonts:
+            cls._fonts[size] = pygame.font.SysFont(FontSettings.NAME, size)
+        return cls._fonts[size]
+
+    @classmethod
+    def render(cls, text, size, color):
+        key = (text, size, color)
+        if key not in cls._surfaces:
+            cls._surfaces[key] = cls.get_font(size).render(text, True, color)
+        return cls._surfaces[key]
+
+
 class Button:
-    def __init__(self, color, x, y, width, height, text=''):
+    def __init__(self, color, x, y, width, height, text='', text_color=Colors.BLACK):
         self.color = color
         self.x = x
         self.y = y
         self.width = width
         self.height = height
-        self.text = text
+        self._text = text
+        self._text_color = text_color
+        self._text_surface = None
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if text != self._text:
+            self._text = text
+            self._text_surface = None
+
+    @property
+    def text_color(self):
+        return self._text_color
+
+    @text_color.setter
+    def text_color(self, text_color):
+        if text_color != self._text_color:
+            self._text_color = text_color
+            self._text_surface = None
+
+    def get_text_surface(self):
+        if self._text_surface is None:
+            self._text_surface = FontCache.render(self._text, FontSettings.BUTTON_SIZE, self._text_color)
+        return self._text_surface
 
     def draw(self, window, outline=1):
 
@@ -107,10 +238,14 @@ class Button:
         pygame.draw.rect(window, self.color, (self.x, self.y, self.width, self.height), 0)
 
         if self.text != '':
-            font = pygame.font.SysFont('comicsans', 30)
-            text = font.render(self.text, True, (0, 0, 0))
+            text = self.get_text_surface()
             window.blit(text, (self.x + (self.width / 2 - text.get_width() / 2), self.y + (self.height / 2 - text.get_height() / 2)))
 
+    def get_rect(self, outline=1):
+        if outline:
+            return pygame.Rect(self.x - 2, self.y - 2, self.width + 4, self.height + 4)
+        return pygame.Rect(self.x, self.y, self.width, self.height)
+
     def is_over(self, position):
         if self.x < position[0] < self.x + self.width:
             if self.y < position[1] < self.y + self.height:
@@ -0,0 +1,79 @@
+from constants import BoardSettings, Colors, SearchSettings, ZobristSettings
+import random
+
+
+def _build_keys():
+    generator = random.Random(ZobristSettings.SEED)
+    piece_keys = [[[generator.getrandbits(ZobristSettings.BITS) for _ in range(4)] for _ in range(BoardSettings.COLS)] for _ in range(BoardSettings.ROWS)]
+    white_to_move_key = generator.getrandbits(ZobristSettings.BITS)
+    # Squares of larger variant boards get keys drawn afterwards, so the classic hashes and the opening book stay valid
+    for row in range(ZobristSettings.MAX_SIZE):
+        if row == len(piece_keys):
+            piece_keys.append([])
+        while len(piece_keys[row]) < ZobristSettings.MAX_SIZE:
+            piece_keys[row].append([generator.getrandbits(ZobristSettings.BITS) for _ in range(4)])
+    return piece_keys, white_to_move_key
+
+
+PIECE_KEYS, WHITE_TO_MOVE_KEY = _build_keys()
+
+
+def piece_key(row, col, color, king):
+    return PIECE_KEYS[row][col][(2 if color == Colors.RED else 0) + (1 if king else 0)]
+
+
+def turn_key(color):
+    return WHITE_TO_MOVE_KEY if color == Colors.WHITE else 0
+
+
+class Bound:
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+class TranspositionEntry:
+    __slots__ = ('key', 'depth', 'score', 'bound', 'best_move', 'generation')
+
+    def __init__(self, key, depth, score, bound, best_move, generation):
+        self.key = key
+        self.depth = depth
+        self.score = score
+        self.bound = bound
+        self.best_move = best_move
+        self.generation = generation
+
+
+class TranspositionTable:
+    def __init__(self, size=SearchSettings.TRANSPOSITION_TABLE_SIZE):
+        self._size = size
+        self._entries = [None] * size
+        self._generation = 0
+        self.hits = 0
+        self.stores = 0
+
+    def new_search(self):
+        self._generation += 1
+
+    def clear(self):
+        self._entries = [None] * self._size
+        self._generation = 0
+
+    def probe(self, key):
+        entry = self._entries[key % self._size]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, best_move):
+        index = key % self._size
+        entry = self._entries[index]
+        # Depth-preferred replacement; entries left over from an older search can always be overwritten
+        if entry is not None and entry.depth > depth and entry.generation == self._generation:
+            return
+        self._entries[index] = TranspositionEntry(key, depth, score, bound, best_move, self._generation)
+        self.stores += 1
+
+    def __len__(self):
+        return sum(1 for entry in self._entries if entry is not None)